@@ -1,10 +1,17 @@
+import asyncio
+import operator
 import os
+import re
+from functools import lru_cache
 from pathlib import Path
-from typing import Any, Dict, Iterable, List, Optional
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional
 
-from volcenginesdkarkruntime import Ark
+from volcenginesdkarkruntime import Ark, AsyncArk
 
 DEFAULT_BASE_URL = "https://ark.cn-beijing.volces.com/api/v3"
+DEFAULT_ENV_PATH = Path(__file__).resolve().parent.parent / ".env"
+DELTA_CONTENT = operator.attrgetter("delta.content")
+ENV_LINE_RE = re.compile(rb"^[ \t]*([^#\s=][^=\r\n]*?)[ \t]*=[ \t]*([^\r\n]*?)[ \t]*\r?$", re.M)
 
 
 def build_messages(text: str, image_url: Optional[str] = None) -> List[Dict[str, Any]]:
@@ -21,16 +28,32 @@ def build_messages(text: str, image_url: Optional[str] = None) -> List[Dict[str,
     return [{"role": "user", "content": text}]
 
 
-def create_client(
-    api_key: Optional[str] = None,
-    base_url: str = DEFAULT_BASE_URL,
-) -> Ark:
-    if not os.environ.get("ARK_API_KEY"):
+@lru_cache(maxsize=8)
+def _get_client(base_url: str, api_key: str) -> Ark:
+    return Ark(base_url=base_url, api_key=api_key)
+
+
+def resolve_api_key(api_key: Optional[str] = None) -> str:
+    if not api_key and not os.environ.get("ARK_API_KEY"):
         load_env_file()
     key = api_key or os.environ.get("ARK_API_KEY")
     if not key:
         raise RuntimeError("Missing ARK_API_KEY environment variable.")
-    return Ark(base_url=base_url, api_key=key)
+    return key
+
+
+def create_client(
+    api_key: Optional[str] = None,
+    base_url: str = DEFAULT_BASE_URL,
+) -> Ark:
+    return _get_client(base_url, resolve_api_key(api_key))
+
+
+def create_async_client(
+    api_key: Optional[str] = None,
+    base_url: str = DEFAULT_BASE_URL,
+) -> AsyncArk:
+    return AsyncArk(base_url=base_url, api_key=resolve_api_key(api_key))
 
 
 def resolve_model(model: Optional[str] = None) -> str:
@@ -41,18 +64,17 @@ def resolve_model(model: Optional[str] = None) -> str:
 
 
 def load_env_file(env_path: Optional[Path] = None) -> None:
-    path = env_path or (Path(__file__).resolve().parent.parent / ".env")
+    path = env_path or DEFAULT_ENV_PATH
     if not path.exists():
         return
-    for raw_line in path.read_text(encoding="utf-8").splitlines():
-        line = raw_line.strip()
-        if not line or line.startswith("#") or "=" not in line:
-            continue
-        key, value = line.split("=", 1)
-        key = key.strip()
-        value = value.strip().strip('"').strip("'")
-        if key and key not in os.environ:
-            os.environ[key] = value
+    for match in ENV_LINE_RE.finditer(path.read_bytes()):
+        value = match.group(2).strip(b'"').strip(b"'")
+        os.environ.setdefault(match.group(1).decode("utf-8"), value.decode("utf-8"))
+
+
+def delta_content(chunk: Any) -> Optional[str]:
+    choices = chunk.choices
+    return DELTA_CONTENT(choices[0]) if choices else None
 
 
 def chat_completion(
@@ -88,13 +110,65 @@ def chat_completion_stream(
         stream=True,
     )
     for chunk in stream:
-        if not chunk.choices:
-            continue
-        delta = chunk.choices[0].delta.content
+        delta = delta_content(chunk)
         if delta:
             yield delta
 
 
+async def chat_completion_astream(
+    messages: List[Dict[str, Any]],
+    model: Optional[str] = None,
+    base_url: str = DEFAULT_BASE_URL,
+    api_key: Optional[str] = None,
+    reasoning_effort: str = "medium",
+) -> AsyncIterator[str]:
+    model = resolve_model(model)
+    # 客户端与流都在退出时关闭（包括调用方提前停止迭代），避免遗留连接池与未关闭警告
+    async with create_async_client(api_key=api_key, base_url=base_url) as client:
+        stream = await client.chat.completions.create(
+            model=model,
+            messages=messages,
+            reasoning_effort=reasoning_effort,
+            stream=True,
+        )
+        async with stream:
+            async for chunk in stream:
+                delta = delta_content(chunk)
+                if delta:
+                    yield delta
+
+
+async def chat_completion_many(
+    batches: List[List[Dict[str, Any]]],
+    model: Optional[str] = None,
+    base_url: str = DEFAULT_BASE_URL,
+    api_key: Optional[str] = None,
+    reasoning_effort: str = "medium",
+    concurrency: int = 8,
+) -> List[str]:
+    model = resolve_model(model)
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+
+    async def complete(messages: List[Dict[str, Any]]) -> str:
+        async with semaphore:
+            completion = await client.chat.completions.create(
+                model=model,
+                messages=messages,
+                reasoning_effort=reasoning_effort,
+            )
+        return completion.choices[0].message.content or ""
+
+    async with create_async_client(api_key=api_key, base_url=base_url) as client:
+        tasks = [asyncio.ensure_future(complete(messages)) for messages in batches]
+        try:
+            return await asyncio.gather(*tasks)
+        finally:
+            # 任一请求失败时先取消并等待其余请求结束，再关闭共用的客户端；异常照常向上抛出
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+
 if __name__ == "__main__":
     sample_messages = build_messages("Hello from Doubao.")
     print(chat_completion(sample_messages))
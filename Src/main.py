@@ -1,27 +1,56 @@
 import concurrent.futures
 import hashlib
 import json
+import mmap
+import operator
 import os
+import queue
 import re
 import shutil
 import subprocess
+import sys
+import threading
 import time
+from functools import lru_cache
 from pathlib import Path
-from typing import Iterable, List, Optional, Set
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
 
-from doubao_client import DEFAULT_BASE_URL, build_messages, chat_completion
-from pdf_reader import extract_text_from_pdf
+from doubao_client import (
+    DEFAULT_BASE_URL,
+    build_messages,
+    chat_completion,
+    load_env_file,
+)
+from pdf_reader import (
+    EXTRACTOR_VERSION,
+    PAGES_BLOB_NAME,
+    extract_text_from_pdf,
+    fadvise,
+    iter_pages_blob,
+    pages_blob_ranges,
+    process_pool_context,
+    resolve_pdf_workers,
+)
 from ocr_client import (
+    ocr_image_path_batch_to_texts,
     ocr_image_path_to_text,
+    ocr_image_paths_to_texts,
+    resolve_ocr_batch_size,
+    resolve_ocr_executor,
     resolve_ocr_workers,
     resolve_visual_ocr_config,
 )
 from word_writer import write_markdown_doc, write_text_doc
 
 try:
-    from docx import Document as DocxDocument
+    import blake3
+except ImportError:
+    blake3 = None
+
+try:
+    import orjson
 except ImportError:
-    DocxDocument = None
+    orjson = None
 
 BASE_DIR = Path(__file__).resolve().parent.parent
 INPUT_DIR = BASE_DIR / "Input" / "pdfData"
@@ -30,6 +59,7 @@ PHOTO_INPUT_DIR = BASE_DIR / "Input" / "photoData"
 TEXT_DIR = BASE_DIR / "Output" / "text"
 PHOTO_TEXT_DIR = TEXT_DIR / "photo_texts"
 OUTPUT_DIR = TEXT_DIR / "combined_documents"
+TRASH_PREFIX = ".trash_"
 OUTPUT_PDF_TXT = OUTPUT_DIR / "综合文档pdf版本.txt"
 OUTPUT_WORD_TXT = OUTPUT_DIR / "综合文档word版本.txt"
 OUTPUT_MERGED_TXT = OUTPUT_DIR / "综合合并文档.txt"
@@ -46,11 +76,30 @@ OUTPUT_LITIGATION_STRATEGY_TXT = OUTPUT_DIR / "诉讼策略报告要求文档.tx
 AI_OUTPUT_DIR = OUTPUT_DIR / "ai_documents"
 AI_OUTPUT_INDEX = AI_OUTPUT_DIR / "ai_outputs.json"
 SNAPSHOT_FILE = OUTPUT_DIR / "input_snapshot.json"
+SNAPSHOT_VERSION = 2
+PDF_MANIFEST_FILE = TEXT_DIR / "manifest.json"
 TITLE_WIDTH = 80
-CONTROL_CHARS_RE = re.compile(r"[\x00-\x08\x0b\x0c\x0e-\x1f\x7f]")
-HYPERLINK_LINE_RE = re.compile(r"^HYPERLINK\\b", re.IGNORECASE)
-PAGE_FIELD_RE = re.compile(r"^PAGE/NUMPAGES$", re.IGNORECASE)
-IMAGE_EXTS = {".png", ".jpg", ".jpeg", ".bmp", ".tiff", ".tif", ".webp"}
+PAGE_READ_WORKERS = 16
+COPY_BUFFER_SIZE = 1024 * 1024
+SENDFILE_MIN_BYTES = 64 * 1024
+PAGE_PEEK_SIZE = 256
+PAGE_MMAP_MIN_BYTES = 64 * 1024
+CONTROL_CHARS_TABLE = dict.fromkeys([*range(0x00, 0x09), 0x0b, 0x0c, *range(0x0e, 0x20), 0x7f])
+# 整段文本一次性清理时，splitlines 会视为换行的控制字符改为换行而不是删除，保证分行结果不变
+CONTROL_LINE_BREAKS_TABLE = {**CONTROL_CHARS_TABLE, **dict.fromkeys([0x0b, 0x0c, 0x1c, 0x1d, 0x1e], "\n")}
+PAGE_FILE_RE = re.compile(r"^page_(\d+)\.txt$")
+PDF_EXTS = frozenset({".pdf"})
+WORD_EXTS = frozenset({".doc", ".docx"})
+IMAGE_EXTS = frozenset({".png", ".jpg", ".jpeg", ".bmp", ".tiff", ".tif", ".webp"})
+
+
+def scan_input_files(input_dir: Path, suffixes: frozenset) -> List[Path]:
+    with os.scandir(input_dir) as entries:
+        files = [
+            Path(entry.path) for entry in entries
+            if entry.is_file() and os.path.splitext(entry.name)[1].lower() in suffixes
+        ]
+    return sorted(files, key=lambda p: p.name.lower())
 
 
 def list_pdf_files(input_dir: Path) -> List[Path]:
@@ -58,13 +107,10 @@ def list_pdf_files(input_dir: Path) -> List[Path]:
         print(f"❌ 输入目录不存在: {input_dir}")
         return []
 
-    pdf_files = [
-        path for path in input_dir.iterdir()
-        if path.is_file() and path.suffix.lower() == ".pdf"
-    ]
+    pdf_files = scan_input_files(input_dir, PDF_EXTS)
     if not pdf_files:
         print(f"❌ 没有找到 PDF 文件，请放入目录: {input_dir}")
-    return sorted(pdf_files, key=lambda p: p.name.lower())
+    return pdf_files
 
 
 def list_word_files(input_dir: Path) -> List[Path]:
@@ -72,13 +118,10 @@ def list_word_files(input_dir: Path) -> List[Path]:
         print(f"❌ 输入目录不存在: {input_dir}")
         return []
 
-    word_files = [
-        path for path in input_dir.iterdir()
-        if path.is_file() and path.suffix.lower() in {".doc", ".docx"}
-    ]
+    word_files = scan_input_files(input_dir, WORD_EXTS)
     if not word_files:
         print(f"❌ 没有找到 Word 文件（.doc/.docx），请放入目录: {input_dir}")
-    return sorted(word_files, key=lambda p: p.name.lower())
+    return word_files
 
 
 def list_photo_files(input_dir: Path) -> List[Path]:
@@ -86,48 +129,158 @@ def list_photo_files(input_dir: Path) -> List[Path]:
         print(f"❌ 输入目录不存在: {input_dir}")
         return []
 
-    photo_files = [
-        path for path in input_dir.iterdir()
-        if path.is_file() and path.suffix.lower() in IMAGE_EXTS
-    ]
+    photo_files = scan_input_files(input_dir, IMAGE_EXTS)
     if not photo_files:
         print(f"❌ 没有找到图片文件，请放入目录: {input_dir}")
-    return sorted(photo_files, key=lambda p: p.name.lower())
+    return photo_files
 
 
-def iter_page_files(folder: Path) -> List[Path]:
-    def page_sort_key(path: Path) -> int:
-        name = path.stem
-        if name.startswith("page_"):
-            suffix = name.split("_", 1)[1]
-            if suffix.isdigit():
-                return int(suffix)
-        return 0
-
-    if not folder.exists():
+def iter_page_files(folder: Path) -> List[str]:
+    try:
+        entries = os.scandir(folder)
+    except FileNotFoundError:
         return []
-    page_files = sorted(folder.glob("page_*.txt"), key=page_sort_key)
-    return page_files
+    with entries:
+        numbered = [
+            (int(match.group(1)), entry.path)
+            for entry in entries
+            if entry.name.startswith("page_") and (match := PAGE_FILE_RE.match(entry.name))
+        ]
+    numbered.sort(key=operator.itemgetter(0))
+    return [path for _, path in numbered]
+
+
+def read_page_bytes(page_file: str) -> bytes:
+    with open(page_file, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if size > PAGE_MMAP_MIN_BYTES:
+            # 大页文件用 mmap，只复制去掉首尾空白后的区间，省去整页读入再 strip 的两次拷贝
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                advice = getattr(mmap, "MADV_SEQUENTIAL", None)
+                if advice is not None and hasattr(mm, "madvise"):
+                    mm.madvise(advice)
+                page_range = trimmed_range(mm, 0, size)
+                data = mm[page_range[0]:page_range[1]] if page_range else b""
+        else:
+            fadvise(f.fileno(), "POSIX_FADV_SEQUENTIAL")
+            data = f.read()
+        fadvise(f.fileno(), "POSIX_FADV_DONTNEED")
+    return data
+
+
+def iter_raw_pages(folder: Path) -> Iterable[bytes]:
+    blob_path = folder / PAGES_BLOB_NAME
+    if blob_path.exists():
+        yield from iter_pages_blob(blob_path)
+        return
+
+    page_files = iter_page_files(folder)
+    if not page_files:
+        return
+    workers = min(PAGE_READ_WORKERS, len(page_files))
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+        yield from executor.map(read_page_bytes, page_files)
+
+
+def iter_page_bytes(folder: Path) -> Iterable[bytes]:
+    for data in iter_raw_pages(folder):
+        data = data.strip()
+        if data:
+            yield data
 
 
 def iter_page_texts(folder: Path) -> Iterable[str]:
-    for page_file in iter_page_files(folder):
-        with open(page_file, "r", encoding="utf-8", errors="ignore") as f:
-            text = f.read().strip()
+    for data in iter_raw_pages(folder):
+        text = data.decode("utf-8", errors="ignore").strip()
         if text:
             yield text
 
 
+def trimmed_range(buffer, start: int, end: int) -> Optional[Tuple[int, int]]:
+    """只查看首尾少量字节，返回去掉首尾空白后的区间；整页为空白时返回 None"""
+    head = buffer[start:min(end, start + PAGE_PEEK_SIZE)]
+    leading = len(head) - len(head.lstrip())
+    if leading == len(head):
+        data = buffer[start:end]
+        leading = len(data) - len(data.lstrip())
+        if leading == len(data):
+            return None
+    start += leading
+    tail = buffer[max(start, end - PAGE_PEEK_SIZE):end]
+    trailing = len(tail) - len(tail.rstrip())
+    if trailing == len(tail):
+        data = buffer[start:end]
+        trailing = len(data) - len(data.rstrip())
+    return start, end - trailing
+
+
+def write_blob_pages(output_file, blob_path: Path) -> None:
+    """把 pages.bin 中的非空页写入输出，大页通过 sendfile 在内核中直接复制"""
+    with open(blob_path, "rb") as blob_file:
+        blob_fd = blob_file.fileno()
+        fadvise(blob_fd, "POSIX_FADV_SEQUENTIAL")
+        with mmap.mmap(blob_fd, 0, access=mmap.ACCESS_READ) as mm:
+            first_page = True
+            for page_start, page_end in pages_blob_ranges(mm):
+                page_range = trimmed_range(mm, page_start, page_end)
+                if page_range is None:
+                    continue
+                if not first_page:
+                    output_file.write(b"\n")
+                first_page = False
+
+                start, end = page_range
+                if sys.platform.startswith("linux") and end - start >= SENDFILE_MIN_BYTES:
+                    output_file.flush()
+                    try:
+                        while start < end:
+                            sent = os.sendfile(output_file.fileno(), blob_fd, start, end - start)
+                            if sent == 0:
+                                break
+                            start += sent
+                    except OSError:
+                        pass
+                if start < end:
+                    output_file.write(mm[start:end])
+        fadvise(blob_fd, "POSIX_FADV_DONTNEED")
+
+
 def read_text_from_folder(folder: Path) -> str:
-    return "\n".join(iter_page_texts(folder)).strip()
+    return "\n".join(iter_page_texts(folder))
 
 
-def iter_word_texts(word_path: Path) -> Iterable[str]:
-    def clean_text(value: str) -> str:
-        return CONTROL_CHARS_RE.sub("", value).strip()
+@lru_cache(maxsize=None)
+def load_docx_document_class():
+    # python-docx 会连带导入 lxml，只在真正读取 .docx 时才导入
+    try:
+        from docx import Document
+    except ImportError:
+        return None
+    return Document
 
+
+@lru_cache(maxsize=None)
+def find_textutil() -> Optional[str]:
+    return shutil.which("textutil")
+
+
+def is_field_code_line(text: str) -> bool:
+    """Word 域代码残留行：以 HYPERLINK 单词开头，或整行为 PAGE/NUMPAGES（不区分大小写）"""
+    upper = text.upper()
+    if upper.startswith("HYPERLINK"):
+        next_char = upper[9:10]
+        return not (next_char.isalnum() or next_char == "_")
+    return upper == "PAGE/NUMPAGES"
+
+
+def clean_text(value: str) -> str:
+    return value.translate(CONTROL_CHARS_TABLE).strip()
+
+
+def iter_word_texts(word_path: Path) -> Iterable[str]:
     suffix = word_path.suffix.lower()
     if suffix == ".docx":
+        DocxDocument = load_docx_document_class()
         if DocxDocument is None:
             print("❌ 缺少依赖 python-docx，请先安装: pip install python-docx")
             return
@@ -135,24 +288,27 @@ def iter_word_texts(word_path: Path) -> Iterable[str]:
         doc = DocxDocument(word_path)
         for paragraph in doc.paragraphs:
             text = clean_text(paragraph.text)
-            if text and not HYPERLINK_LINE_RE.match(text) and not PAGE_FIELD_RE.match(text):
+            if text and not is_field_code_line(text):
                 yield text
 
         for table in doc.tables:
             for row in table.rows:
                 cells = []
                 for cell in row.cells:
-                    cell_text = " ".join(
-                        clean_text(p.text) for p in cell.paragraphs if clean_text(p.text)
-                    ).strip()
-                    cells.append(cell_text)
-                row_text = clean_text("\t".join(cells))
-                if row_text and not HYPERLINK_LINE_RE.match(row_text) and not PAGE_FIELD_RE.match(row_text):
+                    parts = []
+                    for paragraph in cell.paragraphs:
+                        cleaned = clean_text(paragraph.text)
+                        if cleaned:
+                            parts.append(cleaned)
+                    cells.append(" ".join(parts))
+                # 单元格文本已清理过，拼接后只需去掉首尾空白
+                row_text = "\t".join(cells).strip()
+                if row_text and not is_field_code_line(row_text):
                     yield row_text
         return
 
     if suffix == ".doc":
-        textutil_path = shutil.which("textutil")
+        textutil_path = find_textutil()
         if not textutil_path:
             print("❌ 无法读取 .doc 文件，请先安装 LibreOffice 或转换为 .docx")
             return
@@ -167,9 +323,9 @@ def iter_word_texts(word_path: Path) -> Iterable[str]:
             message = result.stderr.strip() or "转换失败"
             print(f"❌ .doc 解析失败: {word_path.name}（{message}）")
             return
-        for line in result.stdout.splitlines():
-            line = clean_text(line)
-            if line and not HYPERLINK_LINE_RE.match(line) and not PAGE_FIELD_RE.match(line):
+        for line in result.stdout.translate(CONTROL_LINE_BREAKS_TABLE).splitlines():
+            line = line.strip()
+            if line and not is_field_code_line(line):
                 yield line
         return
 
@@ -183,18 +339,14 @@ def format_title_line(filename: str) -> str:
     return title.center(TITLE_WIDTH)
 
 
-def load_env_file(env_path: Path) -> None:
-    if not env_path.exists():
-        return
-    for raw_line in env_path.read_text(encoding="utf-8").splitlines():
-        line = raw_line.strip()
-        if not line or line.startswith("#") or "=" not in line:
-            continue
-        key, value = line.split("=", 1)
-        key = key.strip()
-        value = value.strip().strip('"').strip("'")
-        if key and key not in os.environ:
-            os.environ[key] = value
+def format_title_bytes(filename: str) -> bytes:
+    title = filename.strip()
+    encoded = title.encode("utf-8")
+    padding = TITLE_WIDTH - len(title)
+    if padding <= 0:
+        return encoded
+    left = padding // 2 + (padding & TITLE_WIDTH & 1)
+    return b" " * left + encoded + b" " * (padding - left)
 
 
 def get_env_value(name: str) -> Optional[str]:
@@ -256,85 +408,219 @@ def format_duration(seconds: float) -> str:
     return f"{hours:.1f}h"
 
 
+def new_digest():
+    if blake3 is not None:
+        return blake3.blake3()
+    return hashlib.sha256()
+
+
 def hash_text(text: str) -> str:
-    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+    digest = new_digest()
+    digest.update(text.encode("utf-8"))
+    return digest.hexdigest()
+
+
+def hash_file(path: Path) -> str:
+    digest = new_digest()
+    with open(path, "rb") as f:
+        fadvise(f.fileno(), "POSIX_FADV_SEQUENTIAL")
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
 
 
 def model_signature(settings: dict) -> str:
     return hash_text(f"{settings['model']}|{settings['reasoning_effort']}")
 
 
-def load_ai_output_index() -> dict:
-    if not AI_OUTPUT_INDEX.exists():
+def ai_cache_key(doc: dict, signature: str) -> str:
+    input_str = doc.get("input_str")
+    if input_str is None:
+        input_str = doc["input_str"] = str(doc["input"])
+    return f"{input_str}|{signature}"
+
+
+def load_json_file(path: Path) -> dict:
+    if not path.exists():
         return {}
     try:
-        return json.loads(AI_OUTPUT_INDEX.read_text(encoding="utf-8"))
-    except (json.JSONDecodeError, OSError):
+        if orjson is not None:
+            return orjson.loads(path.read_bytes())
+        return json.loads(path.read_text(encoding="utf-8"))
+    except (ValueError, OSError):
         return {}
 
 
+def dump_json_bytes(data: dict) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(data, option=orjson.OPT_INDENT_2)
+    return json.dumps(data, ensure_ascii=True, indent=2).encode("utf-8")
+
+
+def load_ai_output_index() -> dict:
+    return load_json_file(AI_OUTPUT_INDEX)
+
+
 def save_ai_output_index(index: dict) -> None:
     AI_OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
-    AI_OUTPUT_INDEX.write_text(
-        json.dumps(index, ensure_ascii=True, indent=2),
-        encoding="utf-8",
-    )
+    AI_OUTPUT_INDEX.write_bytes(dump_json_bytes(index))
+
+
+def load_pdf_manifest() -> dict:
+    return load_json_file(PDF_MANIFEST_FILE)
 
 
-def unique_name(base_name: str, used_names: Set[str], fallback: str = "item") -> str:
+def save_pdf_manifest(manifest: dict) -> None:
+    TEXT_DIR.mkdir(parents=True, exist_ok=True)
+    tmp_path = PDF_MANIFEST_FILE.with_name(f"{PDF_MANIFEST_FILE.name}.tmp")
+    tmp_path.write_bytes(dump_json_bytes(manifest))
+    os.replace(tmp_path, PDF_MANIFEST_FILE)
+
+
+def unique_name(
+    base_name: str,
+    used_names: Set[str],
+    fallback: str = "item",
+    next_index: Optional[Dict[str, int]] = None,
+) -> str:
     base = base_name.strip() or fallback
-    candidate = base
-    index = 1
+    key = base.lower()
+    # next_index 记录每个基础名下一个可用序号，重名很多时无需每次从 1 重新尝试
+    index = next_index.get(key, 0) if next_index is not None else 0
+    candidate = f"{base}_{index}" if index else base
     while candidate.lower() in used_names:
-        candidate = f"{base}_{index}"
         index += 1
+        candidate = f"{base}_{index}"
     used_names.add(candidate.lower())
+    if next_index is not None:
+        next_index[key] = index + 1
     return candidate
 
 
-def resolve_output_folder(pdf_file: Path, used_names: Set[str]) -> Path:
-    candidate = unique_name(pdf_file.stem, used_names, fallback="pdf")
+def resolve_output_folder(
+    pdf_file: Path,
+    used_names: Set[str],
+    next_index: Optional[Dict[str, int]] = None,
+) -> Path:
+    text_dir = os.fspath(TEXT_DIR)
+    candidate = unique_name(pdf_file.stem, used_names, fallback="pdf", next_index=next_index)
+    while os.path.exists(os.path.join(text_dir, candidate)):
+        candidate = unique_name(pdf_file.stem, used_names, fallback="pdf", next_index=next_index)
     return TEXT_DIR / candidate
 
 
-def resolve_output_text_file(base_name: str, used_names: Set[str], folder: Path) -> Path:
-    candidate = unique_name(base_name, used_names, fallback="text")
+def resolve_output_text_file(
+    base_name: str,
+    used_names: Set[str],
+    folder: Path,
+    next_index: Optional[Dict[str, int]] = None,
+) -> Path:
+    candidate = unique_name(base_name, used_names, fallback="text", next_index=next_index)
     return folder / f"{candidate}.txt"
 
 
-def write_combined_pdf_txt(pdf_files: List[Path]) -> None:
-    if not pdf_files:
-        return
+def extraction_marker(output_folder: Path, pdf_hash: str) -> Path:
+    return output_folder / f".done.{pdf_hash}.v{EXTRACTOR_VERSION}"
 
-    TEXT_DIR.mkdir(parents=True, exist_ok=True)
-    OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
-    used_folder_names: Set[str] = {OUTPUT_DIR.name.lower()}
 
-    with open(OUTPUT_PDF_TXT, "w", encoding="utf-8") as output_file:
-        for index, pdf_file in enumerate(pdf_files):
-            output_folder = resolve_output_folder(pdf_file, used_folder_names)
-            extract_text_from_pdf(str(pdf_file), str(output_folder))
+def extract_pdf_cached(pdf_path: str, output_folder: str, pdf_hash: str) -> None:
+    marker = extraction_marker(Path(output_folder), pdf_hash)
+    if marker.exists():
+        return
+    extract_text_from_pdf(pdf_path, output_folder)
+    marker.touch()
 
-            if index > 0:
-                output_file.write("\n\n")
 
-            output_file.write(f"{format_title_line(pdf_file.name)}\n")
+def write_combined_pdf_txt(
+    pdf_files: List[Path],
+    known_hashes: Optional[Dict[str, str]] = None,
+) -> Dict[str, str]:
+    """生成 PDF 综合文档，返回 文件名 -> 内容哈希；known_hashes 中未变更的 PDF 不再重新计算哈希"""
+    if not pdf_files:
+        return {}
 
-            first_page = True
-            for page_text in iter_page_texts(output_folder):
-                if not first_page:
-                    output_file.write("\n")
-                output_file.write(page_text)
-                first_page = False
+    manifest = load_pdf_manifest()
+    used_folder_names: Set[str] = {OUTPUT_DIR.name.lower()}
+    used_folder_names.update(name.lower() for name in manifest.values())
+    next_folder_index: Dict[str, int] = {}
+    current_manifest: dict = {}
+    output_folders: List[Path] = []
+    pending: List[int] = []
+    pdf_hashes: List[str] = []
+    known_hashes = known_hashes or {}
+    for index, pdf_file in enumerate(pdf_files):
+        pdf_hash = known_hashes.get(pdf_file.name) or hash_file(pdf_file)
+        pdf_hashes.append(pdf_hash)
+        if pdf_hash in current_manifest:
+            output_folders.append(TEXT_DIR / current_manifest[pdf_hash])
+            continue
+        cached_name = manifest.get(pdf_hash)
+        if cached_name and extraction_marker(TEXT_DIR / cached_name, pdf_hash).exists():
+            output_folders.append(TEXT_DIR / cached_name)
+            current_manifest[pdf_hash] = cached_name
+            continue
+        output_folder = resolve_output_folder(pdf_file, used_folder_names, next_folder_index)
+        output_folders.append(output_folder)
+        current_manifest[pdf_hash] = output_folder.name
+        pending.append(index)
+
+    workers = max(1, min(resolve_pdf_workers(), len(pending)))
+    # 只有一个待解析 PDF（或只允许一个并发）时在本进程的线程中解析，省去子进程启动与导入开销
+    if workers > 1:
+        # cleanup_outputs 的后台删除线程可能仍在运行，不能直接 fork
+        executor = concurrent.futures.ProcessPoolExecutor(
+            max_workers=workers, mp_context=process_pool_context()
+        )
+    else:
+        executor = concurrent.futures.ThreadPoolExecutor(max_workers=workers)
+    with executor:
+        future_map = {
+            index: executor.submit(
+                extract_pdf_cached,
+                str(pdf_files[index]),
+                str(output_folders[index]),
+                pdf_hashes[index],
+            )
+            for index in pending
+        }
+        with open(OUTPUT_PDF_TXT, "wb", buffering=COPY_BUFFER_SIZE) as output_file:
+            for index, (pdf_file, output_folder) in enumerate(zip(pdf_files, output_folders)):
+                future = future_map.get(index)
+                if future is not None:
+                    try:
+                        future.result()
+                    except Exception as exc:
+                        print(f"❌ PDF 解析失败: {pdf_file.name}（{exc}）")
+
+                if index > 0:
+                    output_file.write(b"\n\n")
+                output_file.write(format_title_bytes(pdf_file.name))
+                output_file.write(b"\n")
+
+                blob_path = output_folder / PAGES_BLOB_NAME
+                if blob_path.exists():
+                    write_blob_pages(output_file, blob_path)
+                    continue
+
+                # 旧版提取结果没有 pages.bin：逐页写入缓冲区，不把整份 PDF 文本聚在内存里
+                for page_index, page_bytes in enumerate(iter_page_bytes(output_folder)):
+                    if page_index > 0:
+                        output_file.write(b"\n")
+                    output_file.write(page_bytes)
+
+    save_pdf_manifest({
+        pdf_hash: folder_name
+        for pdf_hash, folder_name in current_manifest.items()
+        if extraction_marker(TEXT_DIR / folder_name, pdf_hash).exists()
+    })
     print(f"✅ 综合文档 PDF 版本已生成: {OUTPUT_PDF_TXT}")
+    return {pdf_file.name: pdf_hash for pdf_file, pdf_hash in zip(pdf_files, pdf_hashes)}
 
 
 def write_combined_word_txt(word_files: List[Path]) -> None:
     if not word_files:
         return
 
-    OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
-
     with open(OUTPUT_WORD_TXT, "w", encoding="utf-8") as output_file:
         for index, word_file in enumerate(word_files):
             if index > 0:
@@ -355,32 +641,127 @@ def ocr_image_to_text(image_path: Path, config: Optional[dict] = None) -> str:
     return ocr_image_path_to_text(image_path, config)
 
 
-def write_combined_photo_txt(photo_files: List[Path]) -> None:
+def run_photo_ocr(
+    photo_files: List[Path],
+    config: dict,
+    persist_text: Callable[[int, str], None],
+) -> List[str]:
+    executor_mode = resolve_ocr_executor()
+    if executor_mode == "async":
+        results = ocr_image_paths_to_texts(photo_files, config, on_result=persist_text)
+    elif executor_mode == "process":
+        # base64 编码、签名与 JSON 解析占主导时，用多进程绕开 GIL
+        # 按批提交，减少进程间传参开销，并让每个子进程连续复用同一条 HTTPS 长连接
+        results = [""] * len(photo_files)
+        workers = resolve_ocr_workers()
+        batch_size = max(1, min(resolve_ocr_batch_size(), -(-len(photo_files) // workers)))
+        batches = [
+            range(start, min(start + batch_size, len(photo_files)))
+            for start in range(0, len(photo_files), batch_size)
+        ]
+        # 写盘线程已在运行，不能直接 fork，由 process_pool_context 选择 forkserver/spawn
+        with concurrent.futures.ProcessPoolExecutor(
+            max_workers=workers, mp_context=process_pool_context()
+        ) as executor:
+            future_map = {
+                executor.submit(
+                    ocr_image_path_batch_to_texts,
+                    [photo_files[index] for index in batch],
+                    config,
+                ): batch
+                for batch in batches
+            }
+            for future in concurrent.futures.as_completed(future_map):
+                batch = future_map[future]
+                try:
+                    texts = future.result()
+                except Exception as exc:
+                    print(f"❌ OCR 批量识别失败: 第{batch.start + 1}-{batch.stop}张（{exc}）")
+                    texts = [""] * len(batch)
+                for index, text in zip(batch, texts):
+                    results[index] = text
+                    persist_text(index, text)
+    else:
+        def ocr_and_persist(index: int) -> str:
+            photo_file = photo_files[index]
+            try:
+                text = ocr_image_to_text(photo_file, config) or ""
+            except Exception as exc:
+                print(f"❌ OCR 识别失败: {photo_file.name}（{exc}）")
+                text = ""
+            persist_text(index, text)
+            return text
+
+        workers = resolve_ocr_workers()
+        with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(ocr_and_persist, range(len(photo_files))))
+    return results
+
+
+def write_combined_photo_txt(
+    photo_files: List[Path],
+    reusable_texts: Optional[Dict[str, str]] = None,
+) -> Dict[str, str]:
+    """生成图片综合文档，返回 图片名 -> 单图文本文件名；reusable_texts 中的图片直接复用上次的识别结果"""
     if not photo_files:
-        return
-
-    config = resolve_visual_ocr_config()
-    if not config:
-        return
+        return {}
 
-    PHOTO_TEXT_DIR.mkdir(parents=True, exist_ok=True)
-    OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
+    PHOTO_TEXT_DIR.mkdir(exist_ok=True)
     used_names: Set[str] = set()
-    workers = resolve_ocr_workers()
+    next_name_index: Dict[str, int] = {}
+    reusable_texts = reusable_texts or {}
+
+    # 在主线程按输入顺序分配单图文本文件名，保证并发下命名稳定
+    output_text_paths = [
+        resolve_output_text_file(photo_file.stem, used_names, PHOTO_TEXT_DIR, next_name_index)
+        for photo_file in photo_files
+    ]
 
     results: List[str] = [""] * len(photo_files)
-    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
-        future_map = {
-            executor.submit(ocr_image_to_text, photo_file, config): index
-            for index, photo_file in enumerate(photo_files)
-        }
-        for future in concurrent.futures.as_completed(future_map):
-            index = future_map[future]
+    pending: List[int] = []
+    for index, (photo_file, output_text_path) in enumerate(zip(photo_files, output_text_paths)):
+        if reusable_texts.get(photo_file.name) == output_text_path.name:
             try:
-                results[index] = future.result() or ""
-            except Exception as exc:
-                print(f"❌ OCR 识别失败: {photo_files[index].name}（{exc}）")
-                results[index] = ""
+                results[index] = output_text_path.read_text(encoding="utf-8")
+            except OSError:
+                pass
+        # 空结果可能来自上次识别失败，需要重新识别
+        if not results[index]:
+            pending.append(index)
+
+    if pending:
+        config = resolve_visual_ocr_config()
+        if not config:
+            return {}
+        reused = len(photo_files) - len(pending)
+        if reused:
+            print(f"ℹ️ 复用 {reused} 张未变更图片的识别结果，重新识别 {len(pending)} 张")
+
+        # 单独的写入线程消费识别结果，单图文本写盘与仍在进行的 OCR 请求重叠
+        write_queue: "queue.Queue[Optional[Tuple[int, str]]]" = queue.Queue()
+
+        def write_texts() -> None:
+            while (item := write_queue.get()) is not None:
+                index, text = item
+                try:
+                    output_text_paths[index].write_text(text, encoding="utf-8")
+                except OSError as exc:
+                    print(f"❌ 写入图片文本失败: {photo_files[index].name}（{exc}）")
+
+        def persist_text(position: int, text: str) -> None:
+            write_queue.put((pending[position], text))
+
+        writer = threading.Thread(target=write_texts, daemon=True)
+        writer.start()
+        try:
+            pending_results = run_photo_ocr(
+                [photo_files[index] for index in pending], config, persist_text
+            )
+        finally:
+            write_queue.put(None)
+            writer.join()
+        for index, text in zip(pending, pending_results):
+            results[index] = text
 
     with open(OUTPUT_PHOTO_TXT, "w", encoding="utf-8") as output_file:
         for index, photo_file in enumerate(photo_files):
@@ -392,40 +773,106 @@ def write_combined_photo_txt(photo_files: List[Path]) -> None:
             if text:
                 output_file.write(text)
 
-            output_text_path = resolve_output_text_file(photo_file.stem, used_names, PHOTO_TEXT_DIR)
-            output_text_path.write_text(text, encoding="utf-8")
+    # 清理已删除或改名图片遗留的单图文本
+    current_names = {path.name for path in output_text_paths}
+    with os.scandir(PHOTO_TEXT_DIR) as entries:
+        for entry in entries:
+            if entry.name.endswith(".txt") and entry.name not in current_names:
+                os.unlink(entry.path)
 
     print(f"✅ 综合文档 图片版本已生成: {OUTPUT_PHOTO_TXT}")
+    return {
+        photo_file.name: output_text_path.name
+        for photo_file, output_text_path in zip(photo_files, output_text_paths)
+    }
+
+
+def copy_file_contents(source_file, output_file) -> None:
+    if sys.platform.startswith("linux"):
+        output_file.flush()
+        size = os.fstat(source_file.fileno()).st_size
+        offset = 0
+        try:
+            while offset < size:
+                sent = os.sendfile(output_file.fileno(), source_file.fileno(), offset, size - offset)
+                if sent == 0:
+                    break
+                offset += sent
+            return
+        except OSError:
+            source_file.seek(offset)
+    shutil.copyfileobj(source_file, output_file, length=COPY_BUFFER_SIZE)
 
 
 def write_merged_txt(files: List[Path], output_path: Path) -> None:
-    OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
     wrote_any = False
-    with open(output_path, "w", encoding="utf-8") as output_file:
-        for source_path in files:
-            if not source_path.exists() or source_path.stat().st_size == 0:
+    with open(output_path, "wb") as output_file:
+        for source_path in map(os.fspath, files):
+            try:
+                if os.stat(source_path).st_size == 0:
+                    continue
+            except FileNotFoundError:
                 continue
             if wrote_any:
-                output_file.write("\n\n")
-            with open(source_path, "r", encoding="utf-8", errors="ignore") as source_file:
-                shutil.copyfileobj(source_file, output_file)
+                output_file.write(b"\n\n")
+            with open(source_path, "rb") as source_file:
+                fadvise(source_file.fileno(), "POSIX_FADV_SEQUENTIAL")
+                copy_file_contents(source_file, output_file)
             wrote_any = True
     if wrote_any:
         print(f"✅ 综合合并文档已生成: {output_path}")
 
 
-def write_prompt_doc(merged_path: Path, output_path: Path, prompt: str, label: str) -> None:
+def read_content_and_hash(path: Path, content_cache: Dict[Path, Tuple[str, str]]) -> Tuple[str, str]:
+    cached = content_cache.get(path)
+    if cached is None:
+        content = path.read_text(encoding="utf-8", errors="ignore").strip()
+        cached = content_cache[path] = (content, hash_text(content))
+    return cached
+
+
+def normalize_newlines(text: str) -> str:
+    # 与 read_text 的通用换行处理一致：\r\n 与单独的 \r 都视为 \n
+    return text.replace("\r\n", "\n").replace("\r", "\n")
+
+
+def read_merged_text(merged_path: Path) -> Tuple[str, bytes]:
+    """读取综合合并文档一次，返回统一换行并去除首尾空白后的文本及其 UTF-8 编码，供所有提示文档共用"""
     if not merged_path.exists():
+        return "", b""
+    text = normalize_newlines(merged_path.read_bytes().decode("utf-8", errors="ignore")).strip()
+    return text, text.encode("utf-8")
+
+
+def write_prompt_doc(
+    merged_text: str,
+    merged_bytes: bytes,
+    output_path: Path,
+    prompt: str,
+    label: str,
+    content_cache: Optional[Dict[Path, Tuple[str, str]]] = None,
+) -> None:
+    if not merged_bytes:
         return
-    content = merged_path.read_text(encoding="utf-8", errors="ignore").strip()
-    if not content:
-        return
-    output_path.write_text(f"{prompt}\n{content}", encoding="utf-8")
+    # 写入内容已统一换行，缓存的哈希与下次运行 read_content_and_hash 读回的内容一致
+    prompt = normalize_newlines(prompt).strip()
+    prompt_bytes = prompt.encode("utf-8")
+    with open(output_path, "wb") as output_file:
+        output_file.write(prompt_bytes)
+        output_file.write(b"\n")
+        output_file.write(merged_bytes)
+    if content_cache is not None:
+        # 提示语与合并文本都已去除首尾空白，文件内容即 read_content_and_hash 读回的文本，直接按字节计算哈希
+        digest = new_digest()
+        digest.update(prompt_bytes)
+        digest.update(b"\n")
+        digest.update(merged_bytes)
+        content_cache[output_path] = (f"{prompt}\n{merged_text}", digest.hexdigest())
     print(f"✅ {label}已生成: {output_path}")
 
 
 def convert_docx_to_doc(docx_path: Path, doc_path: Path) -> bool:
-    textutil_path = shutil.which("textutil")
+    textutil_path = find_textutil()
     if not textutil_path:
         print(f"⚠️ 未找到 textutil，无法生成 .doc：{doc_path}")
         return False
@@ -443,7 +890,11 @@ def convert_docx_to_doc(docx_path: Path, doc_path: Path) -> bool:
     return True
 
 
-def generate_ai_documents(ai_docs: List[dict], settings: Optional[dict] = None) -> None:
+def generate_ai_documents(
+    ai_docs: List[dict],
+    settings: Optional[dict] = None,
+    content_cache: Optional[Dict[Path, Tuple[str, str]]] = None,
+) -> None:
     if not os.environ.get("ARK_API_KEY"):
         print("⚠️ 缺少 ARK_API_KEY，跳过豆包生成。")
         return
@@ -455,6 +906,8 @@ def generate_ai_documents(ai_docs: List[dict], settings: Optional[dict] = None)
             return
 
     AI_OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
+    if content_cache is None:
+        content_cache = {}
     index = load_ai_output_index()
     retries, backoff = resolve_doubao_retry_settings()
     workers = resolve_doubao_workers()
@@ -466,7 +919,7 @@ def generate_ai_documents(ai_docs: List[dict], settings: Optional[dict] = None)
         if not source_path.exists():
             print(f"⚠️ 缺少输入文档，跳过生成: {source_path}")
             continue
-        content = source_path.read_text(encoding="utf-8", errors="ignore").strip()
+        content, content_hash = read_content_and_hash(source_path, content_cache)
         if not content:
             print(f"⚠️ 输入内容为空，跳过生成: {source_path}")
             continue
@@ -481,8 +934,7 @@ def generate_ai_documents(ai_docs: List[dict], settings: Optional[dict] = None)
         ]
         if not output_paths:
             continue
-        cache_key = f"{source_path}|{signature}"
-        content_hash = hash_text(content)
+        cache_key = ai_cache_key(doc, signature)
         cached = index.get(cache_key, {})
         output_missing = any(not path.exists() for path in output_paths)
         if not output_missing and cached.get("hash") == content_hash:
@@ -501,10 +953,10 @@ def generate_ai_documents(ai_docs: List[dict], settings: Optional[dict] = None)
     print(f"⏳ AI大模型生成任务数: {total_tasks}，并发: {workers}")
 
     def call_doubao(text: str) -> str:
+        messages = build_messages(text)
         attempt = 0
         while True:
             try:
-                messages = build_messages(text)
                 return chat_completion(
                     messages,
                     model=settings["model"],
@@ -551,15 +1003,15 @@ def generate_ai_documents(ai_docs: List[dict], settings: Optional[dict] = None)
             )
             results.append({**task, "response": response})
 
-    for result in results:
+    def write_result(result: dict) -> Tuple[str, dict]:
         doc = result["doc"]
+        response = result["response"]
         output_md = doc.get("output_md")
         if output_md is not None:
             output_md.write_text(response, encoding="utf-8")
 
         output_docx = doc.get("output_docx")
         output_doc = doc.get("output_doc")
-        response = result["response"]
         if output_docx is not None:
             write_markdown_doc(response, output_docx)
         if output_doc:
@@ -570,43 +1022,93 @@ def generate_ai_documents(ai_docs: List[dict], settings: Optional[dict] = None)
             if convert_docx_to_doc(docx_source, output_doc):
                 if docx_source.name.startswith("_tmp_"):
                     docx_source.unlink(missing_ok=True)
-        index[result["cache_key"]] = {
+        return result["cache_key"], {
             "hash": result["hash"],
             "updated_at": time.strftime("%Y-%m-%d %H:%M:%S"),
         }
 
+    if results:
+        write_workers = max(1, min(workers, len(results)))
+        with concurrent.futures.ThreadPoolExecutor(max_workers=write_workers) as executor:
+            future_map = {
+                executor.submit(write_result, result): result for result in results
+            }
+            for future in concurrent.futures.as_completed(future_map):
+                try:
+                    cache_key, entry = future.result()
+                except Exception as exc:
+                    source_path = future_map[future]["doc"]["input"]
+                    print(f"❌ 写入输出失败: {source_path.name}（{exc}）")
+                    continue
+                index[cache_key] = entry
+
     save_ai_output_index(index)
 
 
 def load_snapshot(snapshot_path: Path) -> dict:
-    if not snapshot_path.exists():
-        return {}
-    try:
-        return json.loads(snapshot_path.read_text(encoding="utf-8"))
-    except (json.JSONDecodeError, OSError):
-        return {}
+    snapshot = load_json_file(snapshot_path)
+    return snapshot if isinstance(snapshot, dict) else {}
+
+
+def unchanged_names(previous: dict, current: Dict[str, List[int]]) -> Set[str]:
+    return {name for name, signature in current.items() if previous.get(name) == signature}
+
+
+def file_signatures(files: List[Path]) -> Dict[str, List[int]]:
+    """按文件名记录 [大小, 修改时间(ns)]，用于判断输入内容是否变更"""
+    signatures = {}
+    for file in files:
+        stat = os.stat(file)
+        signatures[file.name] = [stat.st_size, stat.st_mtime_ns]
+    return signatures
 
 
 def save_snapshot(snapshot: dict, snapshot_path: Path) -> None:
     OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
-    snapshot_path.write_text(
-        json.dumps(snapshot, ensure_ascii=True, indent=2),
-        encoding="utf-8",
-    )
+    snapshot_path.write_bytes(dump_json_bytes(snapshot))
+
+
+def remove_tree_in_background(path: Path) -> None:
+    threading.Thread(
+        target=shutil.rmtree,
+        args=(path,),
+        kwargs={"ignore_errors": True},
+        daemon=True,
+    ).start()
 
 
-def cleanup_outputs() -> None:
+def ensure_output_dirs() -> None:
+    """重新生成前统一创建输出目录，各写入函数不再重复 mkdir"""
+    OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
+
+
+def cleanup_outputs(keep: Optional[Set[Path]] = None) -> None:
+    """清理上次的输出；已缓存的 PDF 提取目录与 keep 中的路径保留"""
+    trash_name = ""
     if OUTPUT_DIR.exists():
-        shutil.rmtree(OUTPUT_DIR)
+        # rename 是 O(1)，旧输出改名后在后台删除，不阻塞后续处理
+        trash_name = f"{TRASH_PREFIX}{os.getpid()}_{int(time.time())}"
+        trash_dir = OUTPUT_DIR.with_name(trash_name)
+        os.replace(OUTPUT_DIR, trash_dir)
+        remove_tree_in_background(trash_dir)
     if not TEXT_DIR.exists():
         return
-    for entry in TEXT_DIR.iterdir():
-        if entry == OUTPUT_DIR:
-            continue
-        if entry.is_dir():
-            shutil.rmtree(entry)
-        elif entry.is_file() and entry.suffix.lower() == ".txt":
-            entry.unlink()
+    kept_names = set(load_pdf_manifest().values())
+    kept_names.update(path.name for path in keep or () if path.parent == TEXT_DIR)
+    kept_names.add(OUTPUT_DIR.name)
+    with os.scandir(TEXT_DIR) as entries:
+        for entry in entries:
+            if entry.name in kept_names:
+                continue
+            if entry.name.startswith(TRASH_PREFIX):
+                # 上次运行退出时未删完的残留，同样交给后台线程
+                if entry.name != trash_name and entry.is_dir(follow_symlinks=False):
+                    remove_tree_in_background(Path(entry.path))
+                continue
+            if entry.is_dir(follow_symlinks=False):
+                shutil.rmtree(entry.path)
+            elif entry.is_file() and entry.name.lower().endswith(".txt"):
+                os.unlink(entry.path)
 
 
 def main() -> None:
@@ -663,23 +1165,34 @@ def main() -> None:
             "output_md": AI_OUTPUT_DIR / "诉讼策略报告要求文档_AI.md",
         },
     ]
+    for doc in ai_docs:
+        doc["input_str"] = str(doc["input"])
     try:
         ai_settings = get_doubao_settings()
     except RuntimeError:
         ai_settings = None
     prompt_values = {env_key: get_env_value(env_key) for _, _, env_key in prompt_docs}
+    previous_snapshot = load_snapshot(SNAPSHOT_FILE)
+    if previous_snapshot.get("v") != SNAPSHOT_VERSION:
+        previous_snapshot = {}
     current_snapshot = {
-        "pdf": sorted(file.name for file in pdf_files),
-        "word": sorted(file.name for file in word_files),
-        "photo": sorted(file.name for file in photo_files),
+        "v": SNAPSHOT_VERSION,
+        "pdf": file_signatures(pdf_files),
+        "word": file_signatures(word_files),
+        "photo": file_signatures(photo_files),
+        "pdf_hashes": previous_snapshot.get("pdf_hashes") or {},
+        "photo_texts": previous_snapshot.get("photo_texts") or {},
         "prompts": prompt_values,
     }
-    previous_snapshot = load_snapshot(SNAPSHOT_FILE)
-    prev_prompts = previous_snapshot.get("prompts") if isinstance(previous_snapshot, dict) else None
+    prev_prompts = previous_snapshot.get("prompts")
     inputs_changed = (
-        current_snapshot.get("pdf") != previous_snapshot.get("pdf")
-        or current_snapshot.get("word") != previous_snapshot.get("word")
-        or current_snapshot.get("photo") != previous_snapshot.get("photo")
+        current_snapshot["pdf"],
+        current_snapshot["word"],
+        current_snapshot["photo"],
+    ) != (
+        previous_snapshot.get("pdf"),
+        previous_snapshot.get("word"),
+        previous_snapshot.get("photo"),
     )
     prompts_changed = prompt_values != (prev_prompts or {})
     prompt_docs_missing = any(not output_path.exists() for output_path, _, _ in prompt_docs)
@@ -694,6 +1207,7 @@ def main() -> None:
         if output_path is not None
     )
     ai_inputs_changed = False
+    content_cache: Dict[Path, Tuple[str, str]] = {}
     if ai_settings is not None:
         signature = model_signature(ai_settings)
         ai_index = load_ai_output_index()
@@ -701,12 +1215,12 @@ def main() -> None:
             source_path = doc["input"]
             if not source_path.exists():
                 continue
-            content = source_path.read_text(encoding="utf-8", errors="ignore").strip()
+            content, content_hash = read_content_and_hash(source_path, content_cache)
             if not content:
                 continue
-            cache_key = f"{source_path}|{signature}"
+            cache_key = ai_cache_key(doc, signature)
             cached = ai_index.get(cache_key, {})
-            if cached.get("hash") != hash_text(content):
+            if cached.get("hash") != content_hash:
                 ai_inputs_changed = True
                 break
     if (
@@ -720,24 +1234,50 @@ def main() -> None:
         return
 
     if inputs_changed or not OUTPUT_MERGED_TXT.exists():
-        cleanup_outputs()
-
-        if pdf_files:
-            write_combined_pdf_txt(pdf_files)
+        # 大小与修改时间都未变的文件复用上次的结果：PDF 不再重新计算哈希，图片不再重新识别
+        unchanged_pdfs = unchanged_names(previous_snapshot.get("pdf") or {}, current_snapshot["pdf"])
+        unchanged_photos = unchanged_names(previous_snapshot.get("photo") or {}, current_snapshot["photo"])
+        cleanup_outputs(keep={PHOTO_TEXT_DIR} if photo_files else None)
+        ensure_output_dirs()
+
+        current_snapshot["pdf_hashes"] = write_combined_pdf_txt(pdf_files, {
+            name: pdf_hash
+            for name, pdf_hash in current_snapshot["pdf_hashes"].items()
+            if name in unchanged_pdfs
+        })
         if word_files:
             write_combined_word_txt(word_files)
-        if photo_files:
-            write_combined_photo_txt(photo_files)
+        current_snapshot["photo_texts"] = write_combined_photo_txt(photo_files, {
+            name: text_name
+            for name, text_name in current_snapshot["photo_texts"].items()
+            if name in unchanged_photos
+        })
         write_merged_txt([OUTPUT_PDF_TXT, OUTPUT_WORD_TXT, OUTPUT_PHOTO_TXT], OUTPUT_MERGED_TXT)
 
+    merged_text, merged_bytes = read_merged_text(OUTPUT_MERGED_TXT)
+    # 只有 AI 生成会读取提示文档的内容与哈希，仅为这些文档预填缓存
+    ai_input_paths = {doc["input"] for doc in ai_docs} if ai_settings is not None else set()
+    prompt_jobs = []
     for output_path, label, env_key in prompt_docs:
         prompt = prompt_values.get(env_key)
         if not prompt:
             print(f"⚠️ 缺少提示语 {env_key}，跳过生成: {output_path}")
             continue
-        write_prompt_doc(OUTPUT_MERGED_TXT, output_path, prompt, label)
+        prompt_jobs.append((
+            output_path,
+            prompt,
+            label,
+            content_cache if output_path in ai_input_paths else None,
+        ))
+    if prompt_jobs:
+        workers = min(len(prompt_jobs), os.cpu_count() or 4)
+        with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+            list(executor.map(
+                lambda job: write_prompt_doc(merged_text, merged_bytes, *job),
+                prompt_jobs,
+            ))
     if inputs_changed or prompts_changed or prompt_docs_missing or ai_docs_missing or ai_inputs_changed:
-        generate_ai_documents(ai_docs, ai_settings)
+        generate_ai_documents(ai_docs, ai_settings, content_cache)
     save_snapshot(current_snapshot, SNAPSHOT_FILE)
     total_elapsed = time.monotonic() - start_time
     print(f"✅ 全流程完成，总耗时 {format_duration(total_elapsed)}")
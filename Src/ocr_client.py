@@ -1,13 +1,27 @@
+import asyncio
 import base64
 import datetime
 import hashlib
 import hmac
+import http.client
 import json
 import os
-from typing import Optional
-from urllib.error import HTTPError, URLError
-from urllib.parse import quote, urlencode
-from urllib.request import Request, urlopen
+import ssl
+import threading
+import time
+from functools import lru_cache
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+from urllib.parse import quote, quote_plus, urlencode
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 OCR_HOST_DEFAULT = "visual.volcengineapi.com"
 OCR_REGION_DEFAULT = "cn-north-1"
@@ -16,6 +30,21 @@ OCR_IMAGE_MODE_DEFAULT = "base64"
 OCR_MODE_DEFAULT = "default"
 OCR_ACTION = "OCRNormal"
 OCR_VERSION = "2020-08-26"
+OCR_QUERY = {"Action": OCR_ACTION, "Version": OCR_VERSION}
+OCR_REQUEST_TARGET = f"/?{urlencode(OCR_QUERY)}"
+OCR_TIMEOUT_SECONDS = 30
+OCR_ASYNC_WORKERS_DEFAULT = 16
+OCR_BATCH_SIZE_DEFAULT = 8
+BASE64_CHUNK_SIZE = 57 * 1024  # 3 的倍数，分块编码后拼接结果与整体编码一致
+OCR_RETRY_TIMES_DEFAULT = 2
+OCR_RETRY_BACKOFF_DEFAULT = 1.0
+OCR_RETRY_BACKOFF_MAX = 30.0
+OCR_RETRYABLE_STATUS = frozenset({429, 500, 502, 503, 504})
+OCR_RETRYABLE_CODES = frozenset({50429, 50430, 50500, 50501})  # 视觉服务的 QPS/并发超限与内部错误
+
+_thread_local = threading.local()
+_rate_lock = threading.Lock()
+_next_request_at = 0.0
 
 
 def get_env_value(name: str, default: Optional[str] = None) -> Optional[str]:
@@ -56,7 +85,7 @@ def resolve_visual_ocr_config() -> Optional[dict]:
     }
 
 
-def resolve_ocr_workers() -> int:
+def resolve_ocr_workers(default: Optional[int] = None) -> int:
     raw_value = get_env_value("OCR_MAX_WORKERS")
     if raw_value:
         try:
@@ -65,19 +94,76 @@ def resolve_ocr_workers() -> int:
                 return value
         except ValueError:
             pass
+    if default is not None:
+        return default
     cpu_count = os.cpu_count() or 4
     return max(2, min(4, cpu_count))
 
 
-def image_bytes_to_base64(image_bytes: bytes) -> str:
-    return base64.b64encode(image_bytes).decode("ascii")
+def resolve_ocr_batch_size() -> int:
+    raw_value = get_env_value("OCR_BATCH_SIZE")
+    if raw_value:
+        try:
+            value = int(raw_value)
+            if value > 0:
+                return value
+        except ValueError:
+            pass
+    return OCR_BATCH_SIZE_DEFAULT
+
+
+def resolve_ocr_retry_settings() -> Tuple[int, float]:
+    retries_raw = get_env_value("OCR_RETRY_TIMES")
+    backoff_raw = get_env_value("OCR_RETRY_BACKOFF_SECONDS")
+    retries = OCR_RETRY_TIMES_DEFAULT
+    backoff = OCR_RETRY_BACKOFF_DEFAULT
+    if retries_raw:
+        try:
+            retries = max(0, int(retries_raw))
+        except ValueError:
+            pass
+    if backoff_raw:
+        try:
+            backoff = max(0.1, float(backoff_raw))
+        except ValueError:
+            pass
+    return retries, backoff
+
+
+def ocr_retry_delay(attempt: int, backoff: float) -> float:
+    return min(OCR_RETRY_BACKOFF_MAX, backoff * 2 ** attempt)
+
+
+def reserve_request_slot() -> float:
+    """按 OCR_MAX_RPS 为本次请求预约发送时间，返回需要等待的秒数；未设置时不限速（限速范围为当前进程）"""
+    global _next_request_at
+    raw_value = get_env_value("OCR_MAX_RPS")
+    if not raw_value:
+        return 0.0
+    try:
+        max_rps = float(raw_value)
+    except ValueError:
+        return 0.0
+    if max_rps <= 0:
+        return 0.0
+    with _rate_lock:
+        now = time.monotonic()
+        slot = max(now, _next_request_at)
+        _next_request_at = slot + 1.0 / max_rps
+    return slot - now
+
+
+def image_bytes_to_base64(image_bytes: bytes) -> bytes:
+    return base64.b64encode(image_bytes)
 
 
-def image_path_to_base64(image_path) -> str:
-    return image_bytes_to_base64(image_path.read_bytes())
+def image_path_to_base64(image_path) -> bytes:
+    # 按 3 的倍数分块编码，不必把整张原图与编码结果同时留在内存中
+    with open(image_path, "rb") as f:
+        return b"".join(iter(lambda: base64.b64encode(f.read(BASE64_CHUNK_SIZE)), b""))
 
 
-def build_visual_ocr_body_from_base64(image_base64: str, config: dict) -> dict:
+def build_visual_ocr_body_from_base64(image_base64: bytes, config: dict) -> dict:
     body: dict = {"image_base64": image_base64}
     for key in ("approximate_pixel", "filter_thresh", "mode", "half_to_full"):
         value = config.get(key)
@@ -105,28 +191,35 @@ def build_visual_ocr_body_from_path(image_path, config: dict) -> Optional[dict]:
 
 
 def canonical_query(query: dict) -> str:
+    return canonical_query_from_items(tuple(query.items()))
+
+
+@lru_cache(maxsize=16)
+def canonical_query_from_items(query_items: tuple) -> str:
+    # OCR 请求的查询参数固定不变，编码与排序结果缓存后每次签名直接复用
     items = []
-    for key, value in query.items():
+    for key, value in query_items:
         items.append((quote(str(key), safe="-_.~"), quote(str(value), safe="-_.~")))
     return "&".join(f"{key}={value}" for key, value in sorted(items))
 
 
-def hmac_sha256(key: bytes, msg: str) -> bytes:
-    return hmac.new(key, msg.encode("utf-8"), hashlib.sha256).digest()
+def hmac_sha256(key: bytes, msg: bytes) -> bytes:
+    return hmac.digest(key, msg, "sha256")
 
 
+@lru_cache(maxsize=4)
 def get_signing_key(secret_key: str, date: str, region: str, service: str) -> bytes:
-    kdate = hmac_sha256(secret_key.encode("utf-8"), date)
-    kregion = hmac_sha256(kdate, region)
-    kservice = hmac_sha256(kregion, service)
-    return hmac_sha256(kservice, "request")
+    kdate = hmac_sha256(secret_key.encode("utf-8"), date.encode("ascii"))
+    kregion = hmac_sha256(kdate, region.encode("utf-8"))
+    kservice = hmac_sha256(kregion, service.encode("utf-8"))
+    return hmac_sha256(kservice, b"request")
 
 
 def sign_request(
     path: str,
     method: str,
     headers: dict,
-    body: str,
+    body: bytes,
     query: dict,
     access_key: str,
     secret_key: str,
@@ -136,10 +229,10 @@ def sign_request(
 ) -> None:
     if not path:
         path = "/"
-    format_date = datetime.datetime.utcnow().strftime("%Y%m%dT%H%M%SZ")
+    format_date = datetime.datetime.now(datetime.timezone.utc).strftime("%Y%m%dT%H%M%SZ")
     headers["X-Date"] = format_date
 
-    body_hash = hashlib.sha256(body.encode("utf-8")).hexdigest()
+    body_hash = hashlib.sha256(body).hexdigest()
     headers["X-Content-Sha256"] = body_hash
     if session_token:
         headers["X-Security-Token"] = session_token
@@ -180,7 +273,7 @@ def sign_request(
         ]
     )
     signing_key = get_signing_key(secret_key, format_date[:8], region, service)
-    signature = hmac.new(signing_key, signing_str.encode("utf-8"), hashlib.sha256).hexdigest()
+    signature = hmac_sha256(signing_key, signing_str.encode("utf-8")).hex()
     headers["Authorization"] = (
         "HMAC-SHA256 "
         f"Credential={access_key}/{credential_scope}, "
@@ -189,9 +282,61 @@ def sign_request(
     )
 
 
-def request_visual_ocr(body_params: dict, config: dict) -> Optional[dict]:
-    query = {"Action": OCR_ACTION, "Version": OCR_VERSION}
-    body = urlencode(body_params)
+def async_ocr_available() -> bool:
+    return aiohttp is not None
+
+
+def resolve_ocr_executor() -> str:
+    """图片 OCR 并发方式：async（需 aiohttp）/ thread / process，默认优先 async"""
+    mode = (get_env_value("OCR_EXECUTOR") or "").lower()
+    if mode in {"thread", "process"}:
+        return mode
+    if mode and mode != "async":
+        print(f"⚠️ 未知的 OCR_EXECUTOR: {mode}，使用默认方式")
+    return "async" if async_ocr_available() else "thread"
+
+
+@lru_cache(maxsize=1)
+def get_ssl_context() -> ssl.SSLContext:
+    return ssl.create_default_context()
+
+
+def get_https_connection(host: str) -> http.client.HTTPSConnection:
+    """每个线程按 host 复用一个 HTTPS 长连接，避免每张图片都重新握手 TLS"""
+    connections: Dict[str, http.client.HTTPSConnection] = getattr(_thread_local, "connections", None)
+    if connections is None:
+        connections = _thread_local.connections = {}
+    connection = connections.get(host)
+    if connection is None:
+        connection = connections[host] = http.client.HTTPSConnection(
+            host, timeout=OCR_TIMEOUT_SECONDS, context=get_ssl_context()
+        )
+    return connection
+
+
+def drop_https_connection(host: str) -> None:
+    connections = getattr(_thread_local, "connections", {})
+    connection = connections.pop(host, None)
+    if connection is not None:
+        connection.close()
+
+
+def encode_form_body(body_params: dict) -> bytes:
+    """生成 application/x-www-form-urlencoded 请求体，结果与 urlencode 一致；bytes 值视为 base64 数据"""
+    parts = []
+    for key, value in body_params.items():
+        if isinstance(value, bytes):
+            # base64 字母表中只有 +、/、= 需要转义，整块替换远快于逐字节 quote
+            encoded = value.replace(b"+", b"%2B").replace(b"/", b"%2F").replace(b"=", b"%3D")
+        else:
+            encoded = quote_plus(str(value)).encode("ascii")
+        parts.append(quote_plus(str(key)).encode("ascii") + b"=" + encoded)
+    return b"&".join(parts)
+
+
+def build_visual_ocr_request(body_params: dict, config: dict) -> Tuple[str, bytes, dict]:
+    query = OCR_QUERY
+    body = encode_form_body(body_params)
     host = config["host"]
     headers = {
         "Host": host,
@@ -210,27 +355,110 @@ def request_visual_ocr(body_params: dict, config: dict) -> Optional[dict]:
         config["service"],
         config.get("session_token"),
     )
-    url = f"https://{host}/?{urlencode(query)}"
-    request = Request(url, data=body.encode("utf-8"), headers=headers, method="POST")
-    try:
-        with urlopen(request, timeout=30) as response:
-            data = response.read().decode("utf-8")
-    except HTTPError as exc:
-        data = exc.read().decode("utf-8") if exc.fp else ""
-        print(f"❌ OCR 请求失败: HTTP {exc.code} {exc.reason}")
-        if data:
-            print(data)
-        return None
-    except URLError as exc:
-        print(f"❌ OCR 请求失败: {exc}")
-        return None
+    return OCR_REQUEST_TARGET, body, headers
+
+
+@lru_cache(maxsize=4)
+def ocr_endpoint_url(host: str, target: str) -> str:
+    return f"https://{host}{target}"
+
+
+def parse_visual_ocr_response(data: bytes) -> Optional[dict]:
     try:
+        if orjson is not None:
+            return orjson.loads(data)
         return json.loads(data)
-    except json.JSONDecodeError:
+    except ValueError:
         print("❌ OCR 返回解析失败")
         return None
 
 
+def check_visual_ocr_reply(
+    status: Optional[int], reason: str, data: bytes
+) -> Tuple[Optional[dict], bool, Optional[str]]:
+    """解析一次 OCR 应答，返回 (响应, 是否可重试, 失败描述)；网络错误（status 为 None）、限流与 5xx 可重试"""
+    if status is None:
+        return None, True, reason
+    if status >= 400:
+        return None, status in OCR_RETRYABLE_STATUS, f"HTTP {status} {reason}"
+    response = parse_visual_ocr_response(data)
+    code = response.get("code") if response else None
+    if code in OCR_RETRYABLE_CODES:
+        return response, True, f"code {code}"
+    return response, False, None
+
+
+def report_visual_ocr_failure(response: Optional[dict], error: Optional[str], data: bytes) -> None:
+    # 带错误码的响应交给 extract_ocr_text 输出服务端消息
+    if response is None and error:
+        print(f"❌ OCR 请求失败: {error}")
+        if data:
+            print(data.decode("utf-8", errors="replace"))
+
+
+def send_visual_ocr_request(body_params: dict, config: dict) -> Tuple[Optional[int], str, bytes]:
+    """用线程内长连接发送一次请求，返回 (HTTP 状态码, 原因, 响应体)；连接失败时状态码为 None"""
+    # 每次发送（含重试）都重新签名，避免退避等待期间 X-Date 过期
+    target, body, headers = build_visual_ocr_request(body_params, config)
+    host = config["host"]
+    while True:
+        connection = get_https_connection(host)
+        reused = connection.sock is not None
+        try:
+            connection.request("POST", target, body=body, headers=headers)
+            response = connection.getresponse()
+            return response.status, response.reason, response.read()
+        except (http.client.HTTPException, OSError) as exc:
+            drop_https_connection(host)
+            if reused:
+                # 复用的长连接可能已被服务端关闭，换新连接重试一次
+                continue
+            return None, str(exc), b""
+
+
+def request_visual_ocr(body_params: dict, config: dict) -> Optional[dict]:
+    retries, backoff = resolve_ocr_retry_settings()
+    for attempt in range(retries + 1):
+        wait = reserve_request_slot()
+        if wait > 0:
+            time.sleep(wait)
+        status, reason, data = send_visual_ocr_request(body_params, config)
+        response, retryable, error = check_visual_ocr_reply(status, reason, data)
+        if retryable and attempt < retries:
+            delay = ocr_retry_delay(attempt, backoff)
+            print(f"⚠️ OCR 请求暂时失败（{error}），{delay:.1f}s 后重试")
+            time.sleep(delay)
+            continue
+        report_visual_ocr_failure(response, error, data)
+        return response
+    return None
+
+
+async def request_visual_ocr_async(body_params: dict, config: dict, session) -> Optional[dict]:
+    retries, backoff = resolve_ocr_retry_settings()
+    for attempt in range(retries + 1):
+        wait = reserve_request_slot()
+        if wait > 0:
+            await asyncio.sleep(wait)
+        # 签名在发送前即时生成，避免排队等待期间 X-Date 过期
+        target, body, headers = build_visual_ocr_request(body_params, config)
+        url = ocr_endpoint_url(config["host"], target)
+        try:
+            async with session.post(url, data=body, headers=headers) as reply:
+                status, reason, data = reply.status, reply.reason or "", await reply.read()
+        except (aiohttp.ClientError, asyncio.TimeoutError) as exc:
+            status, reason, data = None, str(exc) or type(exc).__name__, b""
+        response, retryable, error = check_visual_ocr_reply(status, reason, data)
+        if retryable and attempt < retries:
+            delay = ocr_retry_delay(attempt, backoff)
+            print(f"⚠️ OCR 请求暂时失败（{error}），{delay:.1f}s 后重试")
+            await asyncio.sleep(delay)
+            continue
+        report_visual_ocr_failure(response, error, data)
+        return response
+    return None
+
+
 def extract_ocr_text(response: dict) -> str:
     if not response:
         return ""
@@ -256,6 +484,58 @@ def ocr_image_path_to_text(image_path, config: Optional[dict] = None) -> str:
     return extract_ocr_text(response) if response else ""
 
 
+def ocr_image_path_batch_to_texts(image_paths: Sequence, config: dict) -> List[str]:
+    """在同一个工作进程内顺序识别一批图片，复用同一条长连接；单张失败不影响其余图片"""
+    texts = []
+    for image_path in image_paths:
+        try:
+            texts.append(ocr_image_path_to_text(image_path, config) or "")
+        except Exception as exc:
+            print(f"❌ OCR 识别失败: {image_path.name}（{exc}）")
+            texts.append("")
+    return texts
+
+
+def ocr_image_paths_to_texts(
+    image_paths: Sequence,
+    config: dict,
+    workers: Optional[int] = None,
+    on_result: Optional[Callable[[int, str], None]] = None,
+) -> List[str]:
+    """用 aiohttp 并发识别多张图片，结果按输入顺序返回；每张图片完成时调用 on_result"""
+    workers = workers or resolve_ocr_workers(OCR_ASYNC_WORKERS_DEFAULT)
+
+    async def run_all() -> List[str]:
+        semaphore = asyncio.Semaphore(workers)
+        connector = aiohttp.TCPConnector(limit=workers)
+        timeout = aiohttp.ClientTimeout(total=OCR_TIMEOUT_SECONDS)
+        async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+
+            async def ocr_one(index: int, image_path) -> str:
+                try:
+                    async with semaphore:
+                        # 读取与 base64 编码放在信号量内，避免所有图片同时驻留内存
+                        body_params = await asyncio.to_thread(
+                            build_visual_ocr_body_from_path, image_path, config
+                        )
+                        response = None
+                        if body_params:
+                            response = await request_visual_ocr_async(body_params, config, session)
+                    text = extract_ocr_text(response) if response else ""
+                except Exception as exc:
+                    print(f"❌ OCR 识别失败: {image_path.name}（{exc}）")
+                    text = ""
+                if on_result is not None:
+                    on_result(index, text)
+                return text
+
+            return await asyncio.gather(
+                *(ocr_one(index, image_path) for index, image_path in enumerate(image_paths))
+            )
+
+    return asyncio.run(run_all())
+
+
 def ocr_image_bytes_to_text(image_bytes: bytes, config: Optional[dict] = None) -> str:
     config = config or resolve_visual_ocr_config()
     if not config:
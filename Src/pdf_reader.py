@@ -1,26 +1,212 @@
+import mmap
+import multiprocessing
 import os
 import re
-from collections import Counter
-from concurrent.futures import ThreadPoolExecutor, as_completed
+import struct
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from io import BytesIO
+from itertools import repeat
+from pathlib import Path
 
 import pdfplumber
 from pdf2image import convert_from_path
-from langdetect import detect, DetectorFactory
+from langdetect import detect, detector_factory, DetectorFactory
+
+try:
+    import pypdfium2 as pdfium
+except ImportError:
+    pdfium = None
 
 from ocr_client import ocr_image_bytes_to_text, resolve_ocr_workers, resolve_visual_ocr_config
 
 DetectorFactory.seed = 0  # 保持 langdetect 结果稳定
+# langdetect 默认加载全部 55 种语言的 n-gram 表；这里只需区分中日英，加载常见语言子集即可，
+# 代价是子集外的小语种会被归到最接近的已加载语言
+LANGDETECT_PROFILES = (
+    "en", "zh-cn", "zh-tw", "ja", "ko", "es", "fr", "de", "it", "pt", "ru", "ar", "hi", "bn", "id",
+)
+
+EXTRACTOR_VERSION = 1  # 修改提取逻辑或输出格式时递增，使旧的提取缓存失效
+PAGES_BLOB_NAME = "pages.bin"
+PARALLEL_PAGE_THRESHOLD = 20  # 超过该页数的文本 PDF 才按页分段交给多进程提取
+RENDER_BATCH_PAGES = 4  # 影印版 PDF 每次交给 pdftoppm 渲染的页数
+PDF_RENDER_DPI = 200  # 与 pdf2image 的默认分辨率一致
+OCR_PAGE_JPEG_QUALITY = 85  # 影印页以 JPEG 上传：编码比 PNG 快且体积更小，85 对文字识别无明显影响
+PAGE_WRITE_WORKERS = 4  # 后台写 page_N.txt 的线程数
+LANGUAGE_SCAN_WINDOW = 4096  # 语言统计按窗口扫描，每个窗口后检查能否提前得出结论
+SCRIPT_RUN_RE = re.compile(r"([\u4e00-\u9fff]+)|([\u3040-\u30ff]+)|([a-zA-Z]+)")
+
+
+def init_language_factory():
+    """替换 langdetect 的 init_factory：首次检测时只加载 LANGDETECT_PROFILES 中的语言"""
+    if detector_factory._factory is None:
+        profiles = []
+        for lang in LANGDETECT_PROFILES:
+            with open(os.path.join(detector_factory.PROFILES_DIRECTORY, lang), encoding="utf-8") as f:
+                profiles.append(f.read())
+        factory = DetectorFactory()
+        factory.load_json_profile(profiles)
+        detector_factory._factory = factory
+
+
+detector_factory.init_factory = init_language_factory
+
+
+def fadvise(fd, advice_name):
+    """向内核提示文件访问模式；不支持 posix_fadvise 的平台（如 macOS、Windows）直接跳过"""
+    advice = getattr(os, advice_name, None)
+    if advice is not None and hasattr(os, "posix_fadvise"):
+        os.posix_fadvise(fd, 0, 0, advice)
+
+
+def write_pages_blob(output_folder, page_texts):
+    """把所有页文本写入单个 pages.bin：<u32 页数><u32 偏移[页数+1]><UTF-8 文本>"""
+    encoded = [text.encode("utf-8") for text in page_texts]
+    offsets = [0]
+    for data in encoded:
+        offsets.append(offsets[-1] + len(data))
+    header = struct.pack(f"<{len(offsets) + 1}I", len(encoded), *offsets)
+    with open(os.path.join(output_folder, PAGES_BLOB_NAME), "wb") as f:
+        f.write(header)
+        f.writelines(encoded)
+
+
+def pages_blob_ranges(buffer):
+    """解析 pages.bin 头部，返回每页在文件中的 (起始, 结束) 绝对偏移"""
+    (count,) = struct.unpack_from("<I", buffer, 0)
+    offsets = struct.unpack_from(f"<{count + 1}I", buffer, 4)
+    base = 4 * (count + 2)
+    return [(base + start, base + end) for start, end in zip(offsets, offsets[1:])]
+
+
+def iter_pages_blob(blob_path):
+    """用 mmap 读取 pages.bin，按页顺序返回原始 UTF-8 字节（不做解码）"""
+    with open(blob_path, "rb") as f:
+        # 顺序读取且每次运行只读一遍：加大预读，读完后让内核释放页缓存
+        fadvise(f.fileno(), "POSIX_FADV_SEQUENTIAL")
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            for start, end in pages_blob_ranges(mm):
+                yield mm[start:end]
+        fadvise(f.fileno(), "POSIX_FADV_DONTNEED")
+
+
+def resolve_pdf_workers():
+    """PDF 解析进程数：PDF_MAX_WORKERS，未设置或无效时为 CPU 核数"""
+    try:
+        workers = int(os.environ.get("PDF_MAX_WORKERS") or 0)
+    except ValueError:
+        workers = 0
+    if workers <= 0:
+        workers = os.cpu_count() or 1
+    return workers
+
+
+def resolve_page_workers(page_count):
+    """文本 PDF 逐页提取的进程数；已在解析进程池的子进程中时不再嵌套开进程"""
+    if page_count <= PARALLEL_PAGE_THRESHOLD or multiprocessing.parent_process() is not None:
+        return 1
+    return min(resolve_pdf_workers(), page_count)
+
+
+def process_pool_context():
+    """进程池的启动方式：调用方此时往往已有写盘等线程在运行，fork 多线程进程可能死锁，改用 forkserver（非 POSIX 用 spawn）"""
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context("forkserver")
+    return multiprocessing.get_context("spawn")
+
+
+def extract_page_range_texts(pdf_path, start, end):
+    """在子进程中单独打开 PDF，提取 [start, end) 页的文本"""
+    with pdfplumber.open(pdf_path) as pdf:
+        return [page.extract_text() or "" for page in pdf.pages[start:end]]
+
+
+def iter_extracted_page_texts(pdf_path, pdf, known_texts=()):
+    """按页序逐页产出全部页文本，known_texts 为已提取的前几页；页数较多时按连续页段分给多个进程，pdfminer 解析是纯 CPU 计算"""
+    page_count = len(pdf.pages)
+    first = len(known_texts)
+    yield from known_texts
+    workers = resolve_page_workers(page_count - first)
+    if workers <= 1:
+        for page in pdf.pages[first:]:
+            yield page.extract_text() or ""
+        return
+    # 每个页段都要重新打开一次 PDF，分成约 2 倍进程数的段即可兼顾负载均衡与打开开销
+    chunk_size = -(-(page_count - first) // (workers * 2))
+    starts = range(first, page_count, chunk_size)
+    ends = [min(start + chunk_size, page_count) for start in starts]
+    with ProcessPoolExecutor(max_workers=workers, mp_context=process_pool_context()) as executor:
+        for texts in executor.map(extract_page_range_texts, repeat(pdf_path), starts, ends):
+            yield from texts
+
+
+def write_page_file(path, text):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(text)
+
+
+def resolve_write_page_files():
+    """是否额外输出逐页 page_N.txt；流水线只读取 pages.bin，默认不写"""
+    return (os.environ.get("PDF_WRITE_PAGE_FILES") or "").strip().lower() in ("1", "true", "yes", "on")
+
+
+def write_page_files(output_folder, page_texts):
+    """收集全部页文本并返回；开启 PDF_WRITE_PAGE_FILES 时边产出边写 page_N.txt，写盘交给小线程池，与后续页面的提取/识别重叠"""
+    if not resolve_write_page_files():
+        return list(page_texts)
+    texts = []
+    with ThreadPoolExecutor(max_workers=PAGE_WRITE_WORKERS) as io_pool:
+        futures = []
+        for i, text in enumerate(page_texts):
+            texts.append(text)
+            futures.append(io_pool.submit(write_page_file, f"{output_folder}/page_{i + 1}.txt", text))
+        for future in futures:
+            future.result()
+    return texts
+
+
+def iter_rendered_pages(pdf_path, page_count):
+    """按页顺序渲染为 PIL 图片；安装 pypdfium2 时在本进程内渲染，否则分批调用 pdftoppm"""
+    if pdfium is not None:
+        document = pdfium.PdfDocument(pdf_path)
+        try:
+            for index in range(page_count):
+                page = document[index]
+                try:
+                    yield page.render(scale=PDF_RENDER_DPI / 72).to_pil()
+                finally:
+                    page.close()
+        finally:
+            document.close()
+        return
+    for first in range(0, page_count, RENDER_BATCH_PAGES):
+        last = min(first + RENDER_BATCH_PAGES, page_count)
+        yield from convert_from_path(pdf_path, dpi=PDF_RENDER_DPI, first_page=first + 1, last_page=last)
 
 
 def detect_language(text, min_chars=100):
     """改进的语言检测（字符占比 + langdetect）"""
     text = text or ""
-
-    # 统计字符占比
-    chinese_count = len(re.findall(r"[\u4e00-\u9fff]", text))  # 中文字符
-    japanese_count = len(re.findall(r"[\u3040-\u30ff]", text))  # 日文字符
-    english_count = len(re.findall(r"[a-zA-Z]", text))  # 英文字母
+    # 统计字符占比：一次扫描，按连续同类字符段累加长度（中文 / 日文 / 英文字母）
+    counts = [0, 0, 0, 0]
+    length = len(text)
+    for window_start in range(0, length, LANGUAGE_SCAN_WINDOW):
+        window_end = min(window_start + LANGUAGE_SCAN_WINDOW, length)
+        for match in SCRIPT_RUN_RE.finditer(text, window_start, window_end):
+            start, end = match.span()
+            counts[match.lastindex] += end - start
+        if window_end == length:
+            break
+        # 假设剩余字符全部计入其他语言，占比仍超过下面的阈值时，结论已不可能改变，直接返回
+        bound = counts[1] + counts[2] + counts[3] + (length - window_end)
+        if counts[3] > 0.8 * bound:
+            return "en"
+        if counts[1] > 0.5 * bound:
+            return "zh-cn"
+        if counts[2] > 0.5 * bound:
+            return "ja"
+    _, chinese_count, japanese_count, english_count = counts
     total_chars = chinese_count + japanese_count + english_count
 
     # 计算占比
@@ -46,18 +232,23 @@ def detect_language(text, min_chars=100):
             return "ja"
         return "en"
 
-    # 语言混合时才用 langdetect 进一步检测
-    results = []
-    for _ in range(5):  # 进行5次检测，提高稳定性
-        try:
-            results.append(detect(text))
-        except:
-            continue
+    # 语言混合时才用 langdetect 进一步检测；DetectorFactory.seed 固定后结果确定，检测一次即可
+    try:
+        return detect(text)
+    except Exception:
+        return "en"
 
-    if results:
-        return Counter(results).most_common(1)[0][0]  # 返回出现最多次的语言
+def finalize_language(output_folder, page_texts, sample_start_index):
+    """从 sample_start_index 页起取样判断主要语言，写入环境变量与 lang.txt 并返回"""
+    # 页文本本就要写入 pages.bin，直接切片取样，不再另存一份全文；取样为空时退回全文
+    lang_sample = "\n".join(page_texts[sample_start_index:]).strip() or "\n".join(page_texts)
+    detected_lang = detect_language(lang_sample)
+    # 存入环境变量（适用于当前运行环境）
+    os.environ["DETECTED_LANG"] = detected_lang
+    # 存入文件，便于其他 Python 文件访问
+    Path(output_folder, "lang.txt").write_text(detected_lang, encoding="utf-8")
+    return detected_lang
 
-    return "en"
 
 def extract_text_from_pdf(pdf_path, output_folder):
     """自动选择合适方法提取 PDF 文本，并从第5页后判断主要语言"""
@@ -65,9 +256,11 @@ def extract_text_from_pdf(pdf_path, output_folder):
 
     print(f"📄 解析 PDF 文件: {pdf_path}")
 
+    # pdfplumber 会随机跳读 xref 与各页对象，提前让内核把整个文件读入页缓存
+    with open(pdf_path, "rb") as f:
+        fadvise(f.fileno(), "POSIX_FADV_WILLNEED")
+
     is_text_pdf = False
-    full_text = ""
-    text_for_language_detection = ""  # 用于语言检测的文本
 
     with pdfplumber.open(pdf_path) as pdf:
         page_count = len(pdf.pages)
@@ -80,83 +273,62 @@ def extract_text_from_pdf(pdf_path, output_folder):
         else:
             sample_start_index = 0
 
-        if any(page.extract_text() for page in pdf.pages[:3]):
+        # 探测用的前 3 页文本在正式提取时直接复用，避免 pdfminer 重复解析
+        probe_texts = [page.extract_text() or "" for page in pdf.pages[:3]]
+        if any(probe_texts):
             is_text_pdf = True
 
         if is_text_pdf:
             print("📄 该 PDF 具有可选文本，使用 pdfplumber 提取...")
-            for i, page in enumerate(pdf.pages):
-                text = page.extract_text() or ""
-                full_text += text + "\n"
-
-                # 根据页数选择统计起始页
-                if i >= sample_start_index:
-                    text_for_language_detection += text + "\n"
-
-                with open(f"{output_folder}/page_{i + 1}.txt", "w", encoding="utf-8") as f:
-                    f.write(text)
-
-            lang_sample = text_for_language_detection.strip() or full_text
-            detected_lang = detect_language(lang_sample)
-            # 存入环境变量（适用于当前运行环境）
-            os.environ["DETECTED_LANG"] = detected_lang
-
-            # 存入文件，便于其他 Python 文件访问
-            lang_file = os.path.join(output_folder, "lang.txt")
-            with open(lang_file, "w", encoding="utf-8") as f:
-                f.write(detected_lang)
+            page_texts = write_page_files(output_folder, iter_extracted_page_texts(pdf_path, pdf, probe_texts))
+            write_pages_blob(output_folder, page_texts)
         else:
             print("🖼️ 该 PDF 似乎是影印版，使用 OCR 识别...")
             config = resolve_visual_ocr_config()
             if not config:
                 print("❌ 缺少 OCR 配置，无法识别影印版 PDF")
-                for i in range(len(pdf.pages)):
-                    with open(f"{output_folder}/page_{i + 1}.txt", "w", encoding="utf-8") as f:
-                        f.write("")
+                page_texts = write_page_files(output_folder, [""] * len(pdf.pages))
+                write_pages_blob(output_folder, page_texts)
             else:
-                images = convert_from_path(pdf_path)
-                results = [""] * len(images)
+                page_count = len(pdf.pages)
                 workers = resolve_ocr_workers()
-
-                def ocr_page(image):
-                    buffer = BytesIO()
-                    image.save(buffer, format="PNG")
-                    return ocr_image_bytes_to_text(buffer.getvalue(), config)
-
-                with ThreadPoolExecutor(max_workers=workers) as executor:
-                    future_map = {
-                        executor.submit(ocr_page, image): i
-                        for i, image in enumerate(images)
-                    }
-                    for future in as_completed(future_map):
-                        index = future_map[future]
+                def ocr_page(index, image):
+                    try:
+                        buffer = BytesIO()
+                        page_image = image
                         try:
-                            results[index] = future.result() or ""
-                        except Exception as exc:
-                            print(f"❌ OCR 识别失败: 第{index + 1}页（{exc}）")
-                            results[index] = ""
-
-                for i, text in enumerate(results):
-                    full_text += text + "\n"
-
-                    # 根据页数选择统计起始页
-                    if i >= sample_start_index:
-                        text_for_language_detection += text + "\n"
-
-                    with open(f"{output_folder}/page_{i + 1}.txt", "w", encoding="utf-8") as f:
-                        f.write(text)
-
-            lang_sample = text_for_language_detection.strip() or full_text
-            detected_lang = detect_language(lang_sample)
-
-            # 存入环境变量（适用于当前运行环境）
-            os.environ["DETECTED_LANG"] = detected_lang
-
-            # 存入文件，便于其他 Python 文件访问
-            lang_file = os.path.join(output_folder, "lang.txt")
-            with open(lang_file, "w", encoding="utf-8") as f:
-                f.write(detected_lang)
+                            # JPEG 只支持 RGB/灰度，其余模式（如 RGBA、调色板、1 位图）先转换
+                            if image.mode not in ("RGB", "L"):
+                                page_image = image.convert("RGB")
+                            page_image.save(buffer, format="JPEG", quality=OCR_PAGE_JPEG_QUALITY)
+                        finally:
+                            # 编码完成或失败后都立即释放整页渲染图，不等 OCR 请求返回
+                            if page_image is not image:
+                                page_image.close()
+                            image.close()
+                        return ocr_image_bytes_to_text(buffer.getvalue(), config) or ""
+                    except Exception as exc:
+                        print(f"❌ OCR 识别失败: 第{index + 1}页（{exc}）")
+                        return ""
+
+                def ocr_pages(executor):
+                    # 按页序保持至多 workers * 2 页在途：窗口满时先取出最早一页的结果再提交下一页，
+                    # 内存占用随并发数而不是总页数增长，前面的页识别完即可交给写盘
+                    pending = deque()
+                    for index, image in enumerate(iter_rendered_pages(pdf_path, page_count)):
+                        if len(pending) >= workers * 2:
+                            yield pending.popleft().result()
+                        pending.append(executor.submit(ocr_page, index, image))
+                    while pending:
+                        yield pending.popleft().result()
+
+                # 边渲染边识别边写盘，页面渲染、OCR 网络请求与 page_N.txt 写入重叠进行
+                with ThreadPoolExecutor(max_workers=workers) as executor:
+                    page_texts = write_page_files(output_folder, ocr_pages(executor))
+                write_pages_blob(output_folder, page_texts)
 
+        # 根据页数选择统计起始页
+        detected_lang = finalize_language(output_folder, page_texts, sample_start_index)
         print(f"🌍 主要语言检测结果：{detected_lang}")
 
     return detected_lang
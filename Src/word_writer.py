@@ -1,49 +1,73 @@
 import re
 from pathlib import Path
-from typing import List, Tuple
-
-try:
-    from docx import Document
-    from docx.oxml.ns import qn
-    from docx.shared import Pt
-except ImportError:
-    Document = None
-    qn = None
-    Pt = None
-
+from typing import Iterable, List, Tuple
+from xml.sax.saxutils import escape
+
+# python-docx（连带 lxml）在首次生成 Word 文档时才导入，见 load_docx
+Document = None
+qn = None
+Pt = None
+nsdecls = None
+parse_xml = None
+_docx_import_attempted = False
+
+# 行首编号（一、/1./（一））；首字符不符时 match 在 C 层立即失败，比逐字符的 Python 判断（frozenset 查找）更快
 HEADER_RE = re.compile(r"^([一二三四五六七八九十]+、|\d+[\.、]|[（(][一二三四五六七八九十0-9]+[)）])")
 LABEL_LINE_RE = re.compile(r"^([^：\s]{1,8}：)(.*)$")
 LABEL_INLINE_MAX = 20
+EMU_PER_TWIP = 635
+TABLE_LOOK_XML = (
+    '<w:tblLook w:firstColumn="1" w:firstRow="1" w:lastColumn="0" w:lastRow="0"'
+    ' w:noHBand="0" w:noVBand="1" w:val="04A0"/>'
+)
 PARAGRAPH_ENDINGS = ("。", "！", "？", "；", ":", "：", ".", "!", "?", ";")
-MD_CODE_BLOCK_RE = re.compile(r"```.*?```", re.S)
-MD_INLINE_CODE_RE = re.compile(r"`([^`]+)`")
+STANDALONE_ENDINGS = ("：", ":")
+STANDALONE_PREFIXES = ("•", "-", "*")
 MD_BOLD_RE = re.compile(r"(\*\*|__)(.+?)(\1)")
-MD_ITALIC_RE = re.compile(r"(\*|_)([^*_]+?)(\1)")
 MD_HEADING_RE = re.compile(r"^\s{0,3}#{1,6}\s+")
-MD_HEADING_LINE_RE = re.compile(r"^\s{0,3}(#{1,6})\s+(.+)$")
 MD_BLOCKQUOTE_RE = re.compile(r"^\s{0,3}>\s?")
 MD_UL_RE = re.compile(r"^\s*[-*+]\s+")
 MD_HR_RE = re.compile(r"^\s*([-*_]\s*){3,}$")
-MD_LINK_RE = re.compile(r"\[([^\]]+)\]\(([^)]+)\)")
-MD_IMAGE_RE = re.compile(r"!\[([^\]]*)\]\(([^)]+)\)")
 MD_HTML_TAG_RE = re.compile(r"<[^>]+>")
-MD_ORDERED_LIST_RE = re.compile(r"^\s*(\d+)[\.\)、]\s+(.+)$")
-MD_UNORDERED_LIST_RE = re.compile(r"^\s*[-*+]\s+(.+)$")
 MD_TABLE_SEPARATOR_RE = re.compile(r"^\s*\|?\s*[:\-]+\s*(\|\s*[:\-]+\s*)+\|?\s*$")
-
-
-def is_standalone_line(line: str) -> bool:
-    if line.endswith(("：", ":")):
-        return True
-    if HEADER_RE.match(line):
-        return True
-    if line.startswith(("•", "-", "*")):
-        return True
-    return False
-
-
-def ends_paragraph(line: str) -> bool:
-    return line.endswith(PARAGRAPH_ENDINGS)
+# 对去掉首尾空白的行一次匹配出块类型：代码围栏、标题、有序列表、无序列表
+MD_LINE_KIND_RE = re.compile(
+    r"(?P<fence>```)"
+    r"|(?P<heading>#{1,6})\s+(?P<heading_text>.+)$"
+    r"|\d+[\.\)、]\s+(?P<olist_text>.+)$"
+    r"|[-*+]\s+(?P<ulist_text>.+)$"
+)
+# 行内标记合并为一个交替正则一次扫描；分支顺序即同一位置上的优先级
+MD_INLINE_CLEAN_RE = re.compile(
+    r"`(?P<code>[^`]+)`"
+    r"|!\[(?P<image_alt>[^\]]*)\]\((?P<image_src>[^)]+)\)"
+    r"|\[(?P<link_text>[^\]]+)\]\((?P<link_href>[^)]+)\)"
+    r"|(?P<em>[*_])(?P<em_text>[^*_]+?)(?P=em)"
+    r"|<[^>]+>"
+)
+MD_INLINE_TEXT_RE = re.compile(
+    r"(?P<block>(?s:```.*?```))"
+    r"|!\[(?P<image_alt>[^\]]*)\]\((?P<image_src>[^)]+)\)"
+    r"|\[(?P<link_text>[^\]]+)\]\((?P<link_href>[^)]+)\)"
+    r"|`(?P<code>[^`]+)`"
+    r"|(?P<strong>\*\*|__)(?P<strong_text>.+?)(?P=strong)"
+    r"|(?P<em>[*_])(?P<em_text>[^*_]+?)(?P=em)"
+)
+
+
+def load_docx() -> bool:
+    """按需导入 python-docx，只尝试一次；缺少依赖时返回 False"""
+    global Document, qn, Pt, nsdecls, parse_xml, _docx_import_attempted
+    if not _docx_import_attempted:
+        try:
+            from docx import Document
+            from docx.oxml import parse_xml
+            from docx.oxml.ns import nsdecls, qn
+            from docx.shared import Pt
+        except ImportError:
+            pass
+        _docx_import_attempted = True
+    return Document is not None
 
 
 def join_lines(prev: str, next_line: str) -> str:
@@ -58,60 +82,64 @@ def join_lines(prev: str, next_line: str) -> str:
 
 def normalize_text_to_paragraphs(text: str) -> List[str]:
     paragraphs: List[str] = []
+    # 逐行循环是 Word 生成的热点：把正则方法、结尾元组等绑定为局部变量，省去每行的全局查找和函数调用
+    append = paragraphs.append
+    label_line_match = LABEL_LINE_RE.match
+    header_match = HEADER_RE.match
+    paragraph_endings = PARAGRAPH_ENDINGS
+    standalone_endings = STANDALONE_ENDINGS
+    standalone_prefixes = STANDALONE_PREFIXES
+    # current 在每行处理结束时都不会以段落结束符结尾（以结束符结尾的都已立即输出）
     current = ""
     for raw_line in text.splitlines():
         line = raw_line.strip()
         if not line:
             if current:
-                paragraphs.append(current)
+                append(current)
                 current = ""
             continue
-        label_match = LABEL_LINE_RE.match(line)
+        label_match = label_line_match(line)
         if label_match:
             if current:
-                paragraphs.append(current)
+                append(current)
                 current = ""
             rest = label_match.group(2).strip()
-            if not rest:
-                paragraphs.append(line)
-                continue
-            if ends_paragraph(line) or len(rest) <= LABEL_INLINE_MAX:
-                paragraphs.append(line)
-                continue
-            current = line
-            if ends_paragraph(current):
-                paragraphs.append(current)
-                current = ""
+            if not rest or line.endswith(paragraph_endings) or len(rest) <= LABEL_INLINE_MAX:
+                append(line)
+            else:
+                current = line
             continue
-        if is_standalone_line(line):
+        if line.endswith(standalone_endings) or header_match(line) or line.startswith(standalone_prefixes):
             if current:
-                paragraphs.append(current)
+                append(current)
                 current = ""
-            paragraphs.append(line)
+            append(line)
             continue
-        if current:
-            if ends_paragraph(current):
-                paragraphs.append(current)
-                current = line
-            else:
-                current = join_lines(current, line)
-        else:
-            current = line
-        if ends_paragraph(current):
-            paragraphs.append(current)
+        current = join_lines(current, line) if current else line
+        if current.endswith(paragraph_endings):
+            append(current)
             current = ""
     if current:
         paragraphs.append(current)
     return paragraphs
 
 
+def _clean_inline_match(match: "re.Match[str]") -> str:
+    kind = match.lastgroup
+    if kind == "code":
+        return match.group("code")
+    if kind == "image_src":
+        return _clean_inline(f"{match.group('image_alt')} ({match.group('image_src')})")
+    if kind == "link_href":
+        return _clean_inline(f"{match.group('link_text')} ({match.group('link_href')})")
+    if kind == "em_text":
+        return _clean_inline(match.group("em_text"))
+    return ""
+
+
 def _clean_inline(text: str) -> str:
-    cleaned = MD_INLINE_CODE_RE.sub(r"\1", text)
-    cleaned = MD_IMAGE_RE.sub(r"\1 (\2)", cleaned)
-    cleaned = MD_LINK_RE.sub(r"\1 (\2)", cleaned)
-    cleaned = MD_ITALIC_RE.sub(r"\2", cleaned)
-    cleaned = MD_HTML_TAG_RE.sub("", cleaned)
-    return cleaned
+    # 一次扫描完成行内代码、图片、链接、斜体与 HTML 标签的清理；嵌套在链接、斜体内的标记递归处理，行内代码原样保留
+    return MD_INLINE_CLEAN_RE.sub(_clean_inline_match, text)
 
 
 def parse_inline_segments(text: str) -> List[Tuple[str, bool]]:
@@ -137,17 +165,17 @@ def parse_inline_segments(text: str) -> List[Tuple[str, bool]]:
 
 
 def _apply_run_font(run) -> None:
-    run.font.bold = run.bold
     run.font.name = "SimSun"
     if qn is not None:
         run._element.rPr.rFonts.set(qn("w:eastAsia"), "SimSun")
 
 
 def add_runs_with_style(paragraph, text: str) -> None:
+    # 字体与非粗体已由 _apply_normal_style 设在 Normal 样式上，正文 run 只在加粗时写入 <w:b>，不再逐个写 rFonts
     for segment, is_bold in parse_inline_segments(text):
         run = paragraph.add_run(segment)
-        run.bold = is_bold
-        _apply_run_font(run)
+        if is_bold:
+            run.bold = True
 
 
 def split_table_row(line: str) -> List[str]:
@@ -156,25 +184,37 @@ def split_table_row(line: str) -> List[str]:
     return [cell for cell in cells if cell != ""]
 
 
-def is_heading_candidate(line: str) -> bool:
-    if MD_ORDERED_LIST_RE.match(line) or MD_UNORDERED_LIST_RE.match(line):
-        return False
-    if "：" in line or ":" in line:
-        return False
-    if len(line.strip()) > 30:
+def _strip_inline_match(match: "re.Match[str]") -> str:
+    kind = match.lastgroup
+    if kind == "block":
+        return match.group("block").strip("`")
+    if kind == "code":
+        return match.group("code")
+    if kind == "image_src":
+        return _strip_inline(f"{match.group('image_alt')} ({match.group('image_src')})")
+    if kind == "link_href":
+        return _strip_inline(f"{match.group('link_text')} ({match.group('link_href')})")
+    if kind == "strong_text":
+        return _strip_inline(match.group("strong_text"))
+    return _strip_inline(match.group("em_text"))
+
+
+def _strip_inline(text: str) -> str:
+    return MD_INLINE_TEXT_RE.sub(_strip_inline_match, text)
+
+
+def is_numbered_heading(stripped: str) -> bool:
+    """不含冒号的短编号行（如“一、”“（二）”）视为标题；调用方需已排除列表项并去掉首尾空白"""
+    if "：" in stripped or ":" in stripped or len(stripped) > 30:
         return False
-    return HEADER_RE.match(line.strip()) is not None
+    return HEADER_RE.match(stripped) is not None
 
 
 def markdown_to_text(text: str) -> str:
     if not text:
         return ""
-    stripped = MD_CODE_BLOCK_RE.sub(lambda m: m.group(0).strip("`"), text)
-    stripped = MD_IMAGE_RE.sub(r"\1 (\2)", stripped)
-    stripped = MD_LINK_RE.sub(r"\1 (\2)", stripped)
-    stripped = MD_INLINE_CODE_RE.sub(r"\1", stripped)
-    stripped = MD_BOLD_RE.sub(r"\2", stripped)
-    stripped = MD_ITALIC_RE.sub(r"\2", stripped)
+    # 代码块、图片、链接、行内代码、粗体、斜体一次扫描去除；代码内容原样保留
+    stripped = _strip_inline(text)
 
     lines = []
     for raw_line in stripped.splitlines():
@@ -195,76 +235,78 @@ def markdown_to_text(text: str) -> str:
 
 def parse_markdown_blocks(text: str) -> List[Tuple[str, object]]:
     lines = text.splitlines()
+    line_count = len(lines)
+    # 每行只 strip 一次、用合并正则分类一次；段落续行判断直接复用分类结果
+    stripped_lines = [line.strip() for line in lines]
+    line_kinds = [MD_LINE_KIND_RE.match(line) for line in stripped_lines]
     blocks: List[Tuple[str, object]] = []
+    append = blocks.append
+
+    def starts_table(index: int) -> bool:
+        return (
+            "|" in stripped_lines[index]
+            and index + 1 < line_count
+            and MD_TABLE_SEPARATOR_RE.match(lines[index + 1]) is not None
+        )
+
     i = 0
-    while i < len(lines):
-        raw_line = lines[i].rstrip("\n")
-        line = raw_line.rstrip()
-        if not line.strip():
-            blocks.append(("blank", ""))
+    while i < line_count:
+        line = stripped_lines[i]
+        if not line:
+            append(("blank", ""))
             i += 1
             continue
-        if line.strip().startswith("```"):
+        kind_match = line_kinds[i]
+        kind = kind_match.lastgroup if kind_match else None
+        if kind == "fence":
             code_lines = []
             i += 1
-            while i < len(lines) and not lines[i].strip().startswith("```"):
+            while i < line_count and not stripped_lines[i].startswith("```"):
                 code_lines.append(lines[i])
                 i += 1
             i += 1
             code_text = "\n".join(code_lines).strip()
             if code_text:
-                blocks.append(("code", code_text))
+                append(("code", code_text))
             continue
-        heading_match = MD_HEADING_LINE_RE.match(line)
-        if heading_match:
-            level = len(heading_match.group(1))
-            blocks.append(("heading", (level, heading_match.group(2).strip())))
+        # 行首标题最多允许 3 个缩进空白；段落续行里则不限缩进
+        if kind == "heading_text" and len(lines[i]) - len(lines[i].lstrip()) <= 3:
+            level = len(kind_match.group("heading"))
+            append(("heading", (level, kind_match.group("heading_text").strip())))
             i += 1
             continue
-        if "|" in line and i + 1 < len(lines) and MD_TABLE_SEPARATOR_RE.match(lines[i + 1]):
+        if starts_table(i):
             header = split_table_row(line)
             i += 2
             rows = []
-            while i < len(lines) and "|" in lines[i]:
+            while i < line_count and "|" in lines[i]:
                 rows.append(split_table_row(lines[i]))
                 i += 1
             if header or rows:
-                blocks.append(("table", (header, rows)))
+                append(("table", (header, rows)))
             continue
-        ordered_match = MD_ORDERED_LIST_RE.match(line)
-        if ordered_match:
-            blocks.append(("olist", ordered_match.group(2).strip()))
+        if kind == "olist_text":
+            append(("olist", kind_match.group("olist_text").strip()))
             i += 1
             continue
-        unordered_match = MD_UNORDERED_LIST_RE.match(line)
-        if unordered_match:
-            blocks.append(("ulist", unordered_match.group(1).strip()))
+        if kind == "ulist_text":
+            append(("ulist", kind_match.group("ulist_text").strip()))
             i += 1
             continue
-        if is_heading_candidate(line):
-            blocks.append(("heading", (2, line.strip())))
+        if kind is None and is_numbered_heading(line):
+            append(("heading", (2, line)))
             i += 1
             continue
 
-        paragraph_lines = [line.strip()]
+        paragraph_lines = [line]
         i += 1
-        while i < len(lines):
-            peek = lines[i].strip()
-            if not peek:
-                break
-            if peek.startswith("```"):
-                break
-            if MD_HEADING_LINE_RE.match(peek):
-                break
-            if "|" in peek and i + 1 < len(lines) and MD_TABLE_SEPARATOR_RE.match(lines[i + 1]):
-                break
-            if MD_ORDERED_LIST_RE.match(peek) or MD_UNORDERED_LIST_RE.match(peek):
-                break
-            if is_heading_candidate(peek):
+        while i < line_count:
+            peek = stripped_lines[i]
+            if not peek or line_kinds[i] is not None or starts_table(i) or is_numbered_heading(peek):
                 break
             paragraph_lines.append(peek)
             i += 1
-        blocks.append(("paragraph", " ".join(paragraph_lines)))
+        append(("paragraph", " ".join(paragraph_lines)))
     return blocks
 
 
@@ -293,25 +335,51 @@ def add_list_paragraph(doc: "Document", text: str, ordered: bool) -> None:
         add_runs_with_style(paragraph, f"{prefix}{text}")
 
 
+def _table_cell_xml(text: str, cell_open: str) -> str:
+    runs = []
+    for segment, is_bold in parse_inline_segments(text):
+        run_props = "<w:rPr><w:b/></w:rPr>" if is_bold else ""
+        # 与 python-docx 的 run.text 一致：制表符写成 <w:tab/>
+        content = '</w:t><w:tab/><w:t xml:space="preserve">'.join(escape(part) for part in segment.split("\t"))
+        runs.append(f'<w:r>{run_props}<w:t xml:space="preserve">{content}</w:t></w:r>')
+    return f"{cell_open}<w:p>{''.join(runs)}</w:p></w:tc>"
+
+
 def add_table(doc: "Document", header: List[str], rows: List[List[str]]) -> None:
     if not header and not rows:
         return
     columns = max(len(header), max((len(row) for row in rows), default=0))
     if columns == 0:
         return
-    table = doc.add_table(rows=1 + len(rows), cols=columns)
-    table.style = "Table Grid"
-    for col_index in range(columns):
-        cell_text = header[col_index] if col_index < len(header) else ""
-        cell = table.rows[0].cells[col_index]
-        cell.text = ""
-        add_runs_with_style(cell.paragraphs[0], cell_text)
-    for row_index, row in enumerate(rows, start=1):
+    # 整张表拼成一段 XML 交给 lxml 一次解析，避免逐个单元格经 python-docx 对象插入元素
+    section = doc.sections[-1]
+    block_width = section.page_width - section.left_margin - section.right_margin
+    col_width = round((block_width // columns) / EMU_PER_TWIP)
+    try:
+        style_xml = f'<w:tblStyle w:val="{doc.styles["Table Grid"].style_id}"/>'
+    except KeyError:
+        style_xml = ""
+    cell_open = f'<w:tc><w:tcPr><w:tcW w:type="dxa" w:w="{col_width}"/></w:tcPr>'
+    parts = [
+        f'<w:tbl {nsdecls("w")}><w:tblPr>{style_xml}<w:tblW w:type="auto" w:w="0"/>{TABLE_LOOK_XML}</w:tblPr>',
+        "<w:tblGrid>",
+        f'<w:gridCol w:w="{col_width}"/>' * columns,
+        "</w:tblGrid>",
+    ]
+    for row in (header, *rows):
+        parts.append("<w:tr>")
         for col_index in range(columns):
             cell_text = row[col_index] if col_index < len(row) else ""
-            cell = table.rows[row_index].cells[col_index]
-            cell.text = ""
-            add_runs_with_style(cell.paragraphs[0], cell_text)
+            parts.append(_table_cell_xml(cell_text, cell_open))
+        parts.append("</w:tr>")
+    parts.append("</w:tbl>")
+    table = parse_xml("".join(parts))
+    body = doc.element.body
+    sect_pr = body.find(qn("w:sectPr"))
+    if sect_pr is None:
+        body.append(table)
+    else:
+        sect_pr.addprevious(table)
 
 
 def _apply_normal_style(doc: "Document") -> None:
@@ -323,7 +391,7 @@ def _apply_normal_style(doc: "Document") -> None:
 
 
 def write_text_doc(text: str, output_path: Path) -> None:
-    if Document is None:
+    if not load_docx():
         print("❌ 缺少依赖 python-docx，请先安装: pip install python-docx")
         return
 
@@ -347,7 +415,7 @@ def write_text_doc(text: str, output_path: Path) -> None:
 
 
 def write_markdown_doc(text: str, output_path: Path) -> None:
-    if Document is None:
+    if not load_docx():
         print("❌ 缺少依赖 python-docx，请先安装: pip install python-docx")
         return
 
@@ -390,8 +458,8 @@ def write_markdown_doc(text: str, output_path: Path) -> None:
     print(f"✅ Word 已生成: {output_path}")
 
 
-def write_word_doc(text_blocks: List[Tuple[str, str]], output_path: Path) -> None:
-    if Document is None:
+def write_word_doc(text_blocks: Iterable[Tuple[str, str]], output_path: Path) -> None:
+    if not load_docx():
         print("❌ 缺少依赖 python-docx，请先安装: pip install python-docx")
         return
 